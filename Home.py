@@ -3,7 +3,9 @@ from dotenv import load_dotenv
 load_dotenv()
 
 from app.core import CASE_GEN_MODEL, PATIENT_MODEL, EVAL_MODEL
-from app.core.case_generator import generate_case
+from app.core.case_generator import stream_case, StreamingCase, CORE_FIELDS
+from app.core.prefetch import StationPrefetcher
+from app.core.scoring_queue import ScoringQueue
 from app.core.ui import inject_css, feature_list, info_box
 
 # Configure page with collapsed sidebar - hidden via CSS in ui.py
@@ -153,32 +155,42 @@ with left_col:
         
         # Initialize stations and results arrays
         st.session_state.stations = []
-        st.session_state.results = []
+        st.session_state.results = [None] * n_stations  # filled in by station index as grading finishes
+        st.session_state.scoring_queue = ScoringQueue()
         
-        # Show loading indicator
-        with st.spinner(f"Preparing your OSCE exam with {n_stations} stations..."):
-            # Generate all stations upfront instead of using lazy generation
-            for i in range(n_stations):
-                # Only use chief_override for the first station in Custom Cases mode with Specific complaint
-                chief = None
-                if i == 0 and exam_mode == "Custom Cases" and complaint_selection == "Choose Specific":
-                    chief = custom_cc
-                
-                st.session_state.stations.append(
-                    generate_case(
-                        lang=language,
-                        chief_override=chief,
-                        settings=st.session_state.settings
-                    )
-                )
-                
-                # Show progress
-                if n_stations > 1:
-                    progress_percent = (i + 1) / n_stations
-                    st.progress(progress_percent, text=f"Generating station {i+1}/{n_stations}...")
+        # Only use chief_override for the first station in Custom Cases mode with Specific complaint
+        chief = None
+        if exam_mode == "Custom Cases" and complaint_selection == "Choose Specific":
+            chief = custom_cc
+        
+        # Stop any prefetch left over from a previous exam in this session
+        if st.session_state.get("prefetcher") is not None:
+            st.session_state.prefetcher.cancel()
+        st.session_state.prefetcher = None
+        
+        # Only the first station is generated up front, and only until its
+        # first fields have streamed in; the rest arrives during the station
+        with st.spinner("Preparing your first station..."):
+            first = stream_case(
+                lang=language,
+                chief_override=chief,
+                settings=st.session_state.settings
+            )
+            if isinstance(first, StreamingCase):
+                first.wait_for(*CORE_FIELDS)
+            st.session_state.stations.append(first)
+        
+        # Stations 2..N are generated in the background while the student works
+        if n_stations > 1:
+            st.session_state.prefetcher = StationPrefetcher(
+                n_stations,
+                start=1,
+                lang=language,
+                settings=st.session_state.settings
+            )
         
         st.session_state.current = 0
-        st.session_state.lazy_generation = False  # Disable lazy generation since we've created all stations
+        st.session_state.lazy_generation = n_stations > 1  # Remaining stations are loaded from the prefetcher
         st.switch_page("pages/Exam.py")
 
 with right_col:
@@ -1,6 +1,18 @@
 """
 Central model registry – change here, nowhere else.
 """
+import logging
+import os
+
+# Leveled logging for everything under app.*; OSCE_LOG_LEVEL=DEBUG shows the detail
+_log = logging.getLogger("app")
+if not _log.handlers:
+    _handler = logging.StreamHandler()
+    _handler.setFormatter(logging.Formatter("%(asctime)s %(levelname)s %(name)s: %(message)s"))
+    _log.addHandler(_handler)
+    _log.setLevel(os.getenv("OSCE_LOG_LEVEL", "INFO").upper())
+    _log.propagate = False
+
 CASE_GEN_MODEL      = "gpt-4o-mini"     # JSON mode ON
 CASE_OUTLINE_MODEL  = "gpt-4.1-mini"      # First stage of case generation
 PATIENT_MODEL       = "gpt-4.1-nano"     # free-text
@@ -0,0 +1,155 @@
+"""
+Small key/value caches shared by the scoring and LLM layers.
+Values must be JSON-serializable.  Two tiers are available: an in-memory
+LRU and an on-disk SQLite table; ``TieredCache`` puts one in front of the
+other and keeps hit/miss counters.
+Usage:
+    from app.core.cache import LRUCache, SQLiteCache, TieredCache, make_key
+    cache = TieredCache(LRUCache(256), SQLiteCache(".cache/scores.sqlite3"))
+    hit, value = cache.get(make_key({"transcript": t}))
+"""
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+log = logging.getLogger(__name__)
+
+CACHE_DIR = os.getenv("OSCE_CACHE_DIR", ".cache")
+
+def make_key(payload) -> str:
+    """Stable SHA-256 of any JSON-serializable payload."""
+    blob = json.dumps(payload, sort_keys=True, ensure_ascii=False, separators=(",", ":"))
+    return hashlib.sha256(blob.encode("utf-8")).hexdigest()
+
+class LRUCache:
+    """Thread-safe in-memory LRU with optional per-entry TTL."""
+
+    def __init__(self, max_entries:int=256, ttl:float|None=None):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._data = OrderedDict()          # key -> (expires, value)
+        self._lock = threading.Lock()
+
+    def get(self, key:str) -> tuple:
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                return False, None
+            expires, value = item
+            if expires is not None and expires < time.time():
+                del self._data[key]
+                return False, None
+            self._data.move_to_end(key)
+            return True, value
+
+    def set(self, key:str, value, ttl:float|None=None):
+        ttl = self.ttl if ttl is None else ttl
+        with self._lock:
+            self._data[key] = (time.time() + ttl if ttl else None, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+
+    def __len__(self):
+        return len(self._data)
+
+class SQLiteCache:
+    """On-disk cache in one SQLite table, evicting least recently used rows."""
+
+    def __init__(self, path:str, max_entries:int=5000, ttl:float|None=None):
+        self.path = path
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._db = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS cache ("
+            " key TEXT PRIMARY KEY, value TEXT NOT NULL,"
+            " expires REAL, accessed REAL NOT NULL)")
+
+    def get(self, key:str) -> tuple:
+        now = time.time()
+        with self._lock:
+            row = self._db.execute("SELECT value, expires FROM cache WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                return False, None
+            value, expires = row
+            if expires is not None and expires < now:
+                self._db.execute("DELETE FROM cache WHERE key = ?", (key,))
+                return False, None
+            self._db.execute("UPDATE cache SET accessed = ? WHERE key = ?", (now, key))
+        return True, json.loads(value)
+
+    def set(self, key:str, value, ttl:float|None=None):
+        ttl = self.ttl if ttl is None else ttl
+        now = time.time()
+        blob = json.dumps(value, ensure_ascii=False)
+        with self._lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO cache (key, value, expires, accessed) VALUES (?, ?, ?, ?)",
+                (key, blob, now + ttl if ttl else None, now))
+            self._db.execute("DELETE FROM cache WHERE expires IS NOT NULL AND expires < ?", (now,))
+            self._db.execute(
+                "DELETE FROM cache WHERE key IN ("
+                " SELECT key FROM cache ORDER BY accessed DESC LIMIT -1 OFFSET ?)",
+                (self.max_entries,))
+
+    def __len__(self):
+        with self._lock:
+            return self._db.execute("SELECT COUNT(*) FROM cache").fetchone()[0]
+
+class TieredCache:
+    """Memory tier in front of an optional disk tier, with hit/miss counters."""
+
+    def __init__(self, memory:LRUCache, disk:SQLiteCache|None=None):
+        self.memory = memory
+        self.disk = disk
+        self._lock = threading.Lock()
+        self.counters = {"memory_hits": 0, "disk_hits": 0, "misses": 0, "sets": 0}
+
+    def _count(self, name:str):
+        with self._lock:
+            self.counters[name] += 1
+
+    def get(self, key:str) -> tuple:
+        hit, value = self.memory.get(key)
+        if hit:
+            self._count("memory_hits")
+            return True, value
+        if self.disk is not None:
+            try:
+                hit, value = self.disk.get(key)
+            except sqlite3.Error as e:
+                log.warning("Disk cache read failed: %s", e)
+                hit = False
+            if hit:
+                self._count("disk_hits")
+                self.memory.set(key, value)     # promote
+                return True, value
+        self._count("misses")
+        return False, None
+
+    def set(self, key:str, value, ttl:float|None=None):
+        self._count("sets")
+        self.memory.set(key, value, ttl)
+        if self.disk is not None:
+            try:
+                self.disk.set(key, value, ttl)
+            except sqlite3.Error as e:
+                log.warning("Disk cache write failed: %s", e)
+
+    def stats(self) -> dict:
+        with self._lock:
+            out = dict(self.counters)
+        lookups = out["memory_hits"] + out["disk_hits"] + out["misses"]
+        out["hit_rate"] = round((lookups - out["misses"]) / lookups, 3) if lookups else 0.0
+        out["memory_entries"] = len(self.memory)
+        return out
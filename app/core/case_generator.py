@@ -1,43 +1,78 @@
 """
 Case generation now uses a single-stage approach with GPT-4o-mini directly to JSON.
 This is faster than the previous two-stage approach while maintaining quality.
+``stream_case`` streams the same completion so a station can open as soon as
+its first fields have arrived.
 """
 import json
+import logging
+import os
 import random
+import threading
 import time
-from app.core.llm import chat
+from pydantic import ValidationError
+from app.core.llm import chat, stream_chat
+from app.core.json_stream import ObjectStreamParser
 from app.core.schema import OsceCase
+from app.core import case_repair
+from app.core.case_repair import FIELD_TYPES, repair, schema_subset
 from random import choice
 from app.core.name_utils import generate_name
+from app.core.case_pool import get_pool, get_filler, pool_key, random_pool_key, ANY
 from app.core.checklist import CHECKLIST_ITEMS
+from app.core.resilience import time_budget, CASE_GEN_BUDGET
+from app.core import prompts
 from app.core import CASE_GEN_MODEL
 
-# Get the schema and then format it with json.dumps
-_schema = OsceCase.model_json_schema()
-_SCHEMA_STR = json.dumps(_schema, indent=2)
+log = logging.getLogger(__name__)
 
-# Single-stage template - direct to JSON with gpt-4o-mini
-DIRECT_JSON_TEMPLATE = """
-You are an OSCE case writer. Create a medical case directly as JSON matching this schema:
+# Upper bound on concurrent case-generation calls for one exam
+CASE_GEN_WORKERS = int(os.getenv("OSCE_CASE_GEN_WORKERS", "4"))
 
-SCHEMA:
-{schema}
+# Serve cases from the pre-generated case pool when possible
+USE_CASE_POOL = os.getenv("OSCE_CASE_POOL", "0") == "1"
 
-CASE PARAMETERS:
-Language: {lang}
-Category: {category}
-Station focus: {station_type}
-Difficulty (1-5): {difficulty}
-{context_note}
+# Parameter space for fully random cases
+RANDOM_CATEGORIES = ["Family Medicine", "Pediatrics", "Surgery", "Emergency"]
+STATION_TYPES = ["Full OSCE", "History only", "Exam only"]
+GENDERS = ["Male", "Female", "Other"]
+OCCUPATIONS = [
+    "Teacher", "Nurse", "Engineer", "Student", "Retired", 
+    "Office worker", "Construction worker", "Chef", "Driver"
+]
 
-PATIENT INFORMATION:
-Name: {name}
-Age: {age}
-Gender: {gender}
-Occupation: {occupation}
-Chief complaint: {chief}
+# Sections left out of the up-front case and written by a second call,
+# conditioned on the first, in the background or when first needed
+LAZY_SECTIONS    = os.getenv("OSCE_LAZY_SECTIONS", "1") == "1"
+SECTION_PREFETCH = os.getenv("OSCE_SECTION_PREFETCH", "1") == "1"      # 0 = only on first access
+DEFERRED_SECTIONS = ("answer_key", "reviewOfSystems", "labResults", "imagingResults", "marking_sheet")
+# Stand-ins for deferred sections that could not be written, so the core case still validates
+UNAVAILABLE_SECTIONS = {
+    "answer_key": {"main_diagnosis": "Not available", "differentials": [], "management": []},
+    "reviewOfSystems": {},
+    "labResults": {},
+    "imagingResults": {},
+    "marking_sheet": [],
+}
 
-REQUIRED ELEMENTS:
+# Order the model is asked to write fields in, so a streamed case can be
+# shown as soon as the first few have arrived
+CORE_FIELDS = ("chiefComplaint", "candidate_instructions", "patientInfo")       # enough to open the station
+PATIENT_FIELDS = CORE_FIELDS + (                                                # enough for the patient to answer
+    "personality", "backstory", "historyDetails", "pastMedicalHistory", "medications",
+)
+FIELD_ORDER = PATIENT_FIELDS + (
+    "familyHistory", "socialHistory", "physicalFindings", "keyHistoryQuestions",
+    "keyExamManeuvers", "narrative",
+) + DEFERRED_SECTIONS
+CORE_ORDER = tuple(f for f in FIELD_ORDER if f not in DEFERRED_SECTIONS)
+
+# Minified once at import; titles dropped
+_SCHEMA_STR = prompts.minify_schema(OsceCase.model_json_schema())
+_CORE_SCHEMA_STR = prompts.minify_schema(schema_subset(CORE_ORDER + ("lang",)))
+_SECTION_SCHEMA_STR = prompts.minify_schema(schema_subset(DEFERRED_SECTIONS))
+
+FULL_ELEMENTS = """REQUIRED ELEMENTS:
 1. Chief complaint (be specific)
 2. History of present illness (detailed)
 3. Past medical history
@@ -52,7 +87,32 @@ REQUIRED ELEMENTS:
 12. Patient personality (trait and coping style)
 13. Patient backstory (80-100 words on life situation)
 14. Narrative (60-90 words, 3rd person, emotive)
-15. Candidate instructions
+15. Candidate instructions"""
+
+CORE_ELEMENTS = """REQUIRED ELEMENTS:
+1. Chief complaint (be specific)
+2. History of present illness (detailed)
+3. Past medical history
+4. Medications and allergies
+5. Social history
+6. Family history
+7. Physical examination findings
+8. Patient personality (trait and coping style)
+9. Patient backstory (80-100 words on life situation)
+10. Narrative (60-90 words, 3rd person, emotive)
+11. Candidate instructions
+Decide on the diagnosis first so every detail fits it, but do not write
+answer_key, reviewOfSystems, labResults, imagingResults or marking_sheet: they are written separately."""
+
+# Single-stage template - direct to JSON with gpt-4o-mini.
+# Everything static comes before the per-case parameters (shared prompt prefix).
+DIRECT_JSON_TEMPLATE = """
+You are an OSCE case writer. Create a medical case directly as JSON matching this schema:
+
+SCHEMA:
+{schema}
+
+{elements}
 
 OUTPUT RULES:
 1. Follow the schema exactly
@@ -62,26 +122,75 @@ OUTPUT RULES:
 5. Candidate instructions must start with "Time allowed:" and end with "Good luck."
 6. Personality trait must be one of: chatty, terse, irritable, anxious, optimistic, reserved, humorous, skeptical, dramatic
 7. Coping style must be one of: stoical, denial, humor, anger, bargaining, research-focused, spiritual, avoidance
+8. Write the top-level keys in exactly this order: {field_order}
+
+CASE PARAMETERS:
+Language: {lang}
+Category: {category}
+Station focus: {station_type}
+Difficulty (1-5): {difficulty}
+{context_note}
+
+PATIENT INFORMATION:
+Name: {name}
+Age: {age}
+Gender: {gender}
+Occupation: {occupation}
+Chief complaint: {chief}
 """
 
-def generate_case(
-    lang:str="en",
-    chief_override:str|None=None,
-    settings:dict=None
-) -> OsceCase:
-    """Create a fresh OSCE case using a single-stage approach."""
+# Deferred sections, written against the finished core case
+SECTIONS_TEMPLATE = """
+You are completing an OSCE case. Write its remaining sections as one JSON object matching this schema:
+
+SCHEMA:
+{schema}
+
+OUTPUT RULES:
+1. Output ONLY JSON with no explanations or markdown
+2. Write the keys in exactly this order: {section_order}
+3. Everything must fit the case below: the labs and imaging support the main diagnosis and the review of systems matches the history
+4. answer_key.main_diagnosis must be ONE line
+5. marking_sheet has 35 items an examiner would tick for this station
+6. Never leave any list empty; if truly N/A, write ["None"]
+7. Write in the case's language
+
+CASE:
+{case}
+"""
+
+CASE_PROMPT = prompts.register("case_gen", DIRECT_JSON_TEMPLATE, schema=_SCHEMA_STR,
+                               elements=FULL_ELEMENTS, field_order=", ".join(FIELD_ORDER))
+CORE_PROMPT = prompts.register("case_gen_core", DIRECT_JSON_TEMPLATE, schema=_CORE_SCHEMA_STR,
+                               elements=CORE_ELEMENTS, field_order=", ".join(CORE_ORDER))
+SECTIONS_PROMPT = prompts.register("case_gen_sections", SECTIONS_TEMPLATE, schema=_SECTION_SCHEMA_STR,
+                                   section_order=", ".join(DEFERRED_SECTIONS))
+
+def _case_request(lang:str, chief_override:str|None, settings:dict, use_pool:bool|None):
+    """Pick the case parameters.
+
+    Returns ``(pooled_case, lang, values)``; ``pooled_case`` is set when the
+    case was served from the case pool, otherwise ``values`` are the
+    ``CASE_PROMPT`` fields for a live generation.  A requested chief
+    complaint is always generated live.
+    """
+    if use_pool is None:
+        use_pool = USE_CASE_POOL
+    
     if settings.get("fully_random", False):
         # Use completely random parameters
-        category = random.choice(["Family Medicine", "Pediatrics", "Surgery", "Emergency"])
+        category = random.choice(RANDOM_CATEGORIES)
         difficulty = random.randint(1, 5)
-        station_type = random.choice(["Full OSCE", "History only", "Exam only"])
+        station_type = random.choice(STATION_TYPES)
         age = random.randint(18, 90)
-        gender = random.choice(["Male", "Female", "Other"])
-        occupation = random.choice([
-            "Teacher", "Nurse", "Engineer", "Student", "Retired", 
-            "Office worker", "Construction worker", "Chef", "Driver"
-        ])
+        gender = random.choice(GENDERS)
+        occupation = random.choice(OCCUPATIONS)
         chief = None  # Will be generated by the model
+        
+        if use_pool:
+            pooled = checkout_pooled_case(random_pool_key(lang))
+            if pooled is not None:
+                return pooled, lang, None
     else:
         # Use settings provided by the user
         category = settings.get("category", "Family Medicine")
@@ -95,6 +204,12 @@ def generate_case(
         # Check if language is in settings and override if present
         if "language" in settings:
             lang = settings["language"]
+        
+        if use_pool and not chief:
+            pooled = checkout_pooled_case(pool_key(category, difficulty, station_type, gender, lang),
+                                          age=age, occupation=occupation)
+            if pooled is not None:
+                return pooled, lang, None
     
     # Generate a name that's appropriate for the language/culture
     name = generate_name(gender, lang)
@@ -119,97 +234,438 @@ IMPORTANT SCHEMA REQUIREMENTS:
     # Get chief complaint
     chief_complaint = chief or "Generate a realistic chief complaint appropriate for this case"
     
+    return None, lang, dict(
+        lang=lang,
+        category=category,
+        station_type=station_type,
+        difficulty=difficulty,
+        context_note=context_note,
+        name=name,
+        age=age,
+        gender=gender,
+        occupation=occupation,
+        chief=chief_complaint
+    )
+
+def _build_case(case_data:dict, lang:str) -> OsceCase:
+    """Validate a repaired case with its language set."""
+    # Set before validating: assigning to the model would revalidate all of it
+    return OsceCase.model_validate(dict(case_data, lang=lang))
+
+def _generate(prompt:str, temperature:float, caller:str="case_gen") -> dict:
+    raw = chat(
+        [{"role":"system","content": prompt}],
+        model=CASE_GEN_MODEL,
+        json_mode=True,
+        temperature=temperature,
+        max_tokens=2000,
+        stream=False,
+        caller=caller
+    )
+    return json.loads(raw)
+
+@time_budget(CASE_GEN_BUDGET)          # both attempts share one budget
+def generate_case(
+    lang:str="en",
+    chief_override:str|None=None,
+    settings:dict=None,
+    use_pool:bool|None=None,
+    caller:str="case_gen"
+) -> OsceCase:
+    """Create a fresh OSCE case using a single-stage approach.
+
+    With ``use_pool`` (default: ``OSCE_CASE_POOL=1``) cases without a
+    requested chief complaint are checked out of the case pool first and
+    only generated live on a miss.
+    ``caller`` labels the LLM calls, which also sets their scheduler priority.
+    """
+    pooled, lang, values = _case_request(lang, chief_override, settings, use_pool)
+    if pooled is not None:
+        return pooled
+    minutes = settings.get("minutes")
+    
     # SINGLE STAGE: Generate JSON directly with gpt-4o-mini
-    print(f"DEBUG: Starting case generation with direct JSON approach")
+    log.debug("Starting case generation with direct JSON approach")
     start_time = time.time()
+    prompt = CASE_PROMPT.render(**values)
     
     try:
-        # Generate JSON directly
-        raw = chat(
-            [{"role":"system","content": DIRECT_JSON_TEMPLATE.format(
-                schema=_SCHEMA_STR,
-                lang=lang,
-                category=category,
-                station_type=station_type,
-                difficulty=difficulty,
-                context_note=context_note,
-                name=name,
-                age=age,
-                gender=gender,
-                occupation=occupation,
-                chief=chief_complaint
-            )}],
-            model=CASE_GEN_MODEL,
-            json_mode=True,
-            temperature=0.5,  # Slightly higher temperature for creativity
-            max_tokens=2000,
-            stream=False
-        )
-        
-        gen_time = time.time() - start_time
-        print(f"DEBUG: Case generated in {gen_time:.2f} seconds")
-        
-        # Parse the JSON response first
-        case_data = json.loads(raw)
-        
-        # Ensure required fields exist
-        if 'keyHistoryQuestions' not in case_data:
-            case_data['keyHistoryQuestions'] = ["Take a detailed history of the presenting complaint"]
-        
-        if 'keyExamManeuvers' not in case_data:
-            case_data['keyExamManeuvers'] = ["Perform a relevant physical examination"]
-        
-        # Convert back to JSON
-        validated_json = json.dumps(case_data)
-        
-        # Now validate
-        obj = OsceCase.model_validate_json(validated_json)
-        
-        # Make sure the language is set in the case object
-        obj.lang = lang
-        return obj
+        # Slightly higher temperature for creativity; fields that don't validate are repaired
+        fields, outcome = repair(_generate(prompt, 0.5, caller), tuple(FIELD_TYPES), minutes,
+                                 caller=f"{caller}_repair")
+        case_repair.count(outcome)
     except Exception as e:
-        print(f"First attempt failed: {str(e)}")
+        log.warning("First attempt failed: %s", e)
+        case_repair.count("regenerated")
         
         # Second attempt with lower temperature
-        print(f"DEBUG: Retrying with lower temperature")
-        raw2 = chat(
-            [{"role":"system","content": DIRECT_JSON_TEMPLATE.format(
-                schema=_SCHEMA_STR,
-                lang=lang,
-                category=category,
-                station_type=station_type,
-                difficulty=difficulty,
-                context_note=context_note,
-                name=name,
-                age=age,
-                gender=gender,
-                occupation=occupation,
-                chief=chief_complaint
-            )}],
-            model=CASE_GEN_MODEL,
-            json_mode=True,
-            temperature=0.2, 
-            max_tokens=2000,
-            stream=False
-        )
-        
-        # Parse the JSON response
-        case_data = json.loads(raw2)
-        
-        # Ensure required fields exist
-        if 'keyHistoryQuestions' not in case_data:
-            case_data['keyHistoryQuestions'] = ["Take a detailed history of the presenting complaint"]
-        
-        if 'keyExamManeuvers' not in case_data:
-            case_data['keyExamManeuvers'] = ["Perform a relevant physical examination"]
-        
-        # Convert back to JSON
-        validated_json = json.dumps(case_data)
-        
-        # Now validate
-        obj = OsceCase.model_validate_json(validated_json)
-        
-        # Make sure the language is set in the case object
-        obj.lang = lang
-        return obj 
\ No newline at end of file
+        log.debug("Retrying with lower temperature")
+        try:
+            fields, outcome = repair(_generate(prompt, 0.2, caller), tuple(FIELD_TYPES), minutes,
+                                     caller=f"{caller}_repair")
+        except Exception:
+            case_repair.count("failed")
+            raise
+        case_repair.count(outcome, retry=True)
+    obj = _build_case(fields, lang)
+    log.info("Case generated in %.2f seconds", time.time() - start_time)
+    return obj
+
+class StreamingCase:
+    """A generated case whose fields become available while it streams in.
+
+    The completion is parsed member by member on a background thread, in
+    the order given by ``FIELD_ORDER``.  ``has``/``wait_for`` report which
+    fields have arrived; reading a case field (``case.labResults``) waits
+    for just that field.  Once every field is in, the whole case is
+    validated, and from then on attribute access goes to the ``OsceCase``.
+
+    With ``lazy`` only the core case is streamed up front and the
+    ``DEFERRED_SECTIONS`` are written by a second call given the core case:
+    straight away with ``SECTION_PREFETCH``, otherwise the first time one
+    of them is asked for.  Fields that don't validate are repaired
+    (``app.core.case_repair``); only if that fails is the stage regenerated
+    without streaming, keeping the fields the station may already have
+    shown.  If the deferred sections still fail, the case is finished
+    without them: they are listed in ``unavailable`` and hold the
+    ``UNAVAILABLE_SECTIONS`` stand-ins, while the core case stays usable.
+    """
+
+    def __init__(self, lang:str, values:dict, lazy:bool=LAZY_SECTIONS, minutes:int|None=None):
+        self.lang = lang
+        self._values = values
+        self._minutes = minutes
+        self._template = CORE_PROMPT if lazy else CASE_PROMPT
+        self._sections = DEFERRED_SECTIONS if lazy else ()
+        self._fields = {}           # raw JSON values that validated on their own
+        self._invalid = {}          # ... and those that didn't, for repair
+        self._closed = set()        # fields of stages whose JSON object has closed
+        self._case = None
+        self._error = None          # the core case failed
+        self.unavailable = ()       # deferred sections that failed
+        self._core_done = False
+        self._sections_wanted = False
+        self._sections_started = False
+        self._cond = threading.Condition()
+        self._started = time.perf_counter()
+        self.core_s = None          # seconds until CORE_FIELDS were all available
+        self.total_s = None
+        threading.Thread(target=self._run, name="case-stream", daemon=True).start()
+
+    def _add(self, key:str, value, names:tuple):
+        if key not in names:
+            log.debug("Ignoring unexpected case field %r", key)
+            return
+        try:
+            FIELD_TYPES[key].validate_python(value)
+        except ValidationError as e:
+            log.info("Streamed case field %s is invalid: %s", key, e.errors()[0]["msg"])
+            with self._cond:
+                self._invalid[key] = value
+            return
+        with self._cond:
+            self._fields[key] = value
+            self._invalid.pop(key, None)
+            if self.core_s is None and all(f in self._fields for f in CORE_FIELDS):
+                self.core_s = time.perf_counter() - self._started
+                log.info("Case core fields ready in %.2f seconds", self.core_s)
+            self._cond.notify_all()
+
+    def _publish(self, fields:dict, names:tuple):
+        for key, value in fields.items():
+            if self._fields.get(key) != value:
+                self._add(key, value, names)
+
+    def _stream(self, prompt:str, names:tuple, caller:str, max_tokens:int):
+        parser = ObjectStreamParser()
+        for delta in stream_chat([{"role":"system","content": prompt}],
+                                 model=CASE_GEN_MODEL, json_mode=True,
+                                 temperature=0.5, max_tokens=max_tokens, caller=caller):
+            for key, value in parser.feed(delta):
+                self._add(key, value, names)
+        parser.result()                 # raises if the object never closed
+        self._close(names)
+
+    def _close(self, names:tuple):
+        """No more of ``names`` will stream in; optional ones still missing keep their defaults."""
+        with self._cond:
+            self._closed.update(names)
+            self._cond.notify_all()
+
+    def _complete(self, prompt:str, names:tuple, caller:str, max_tokens:int, retry_prompt):
+        """Stream one stage; repair what doesn't validate, regenerate if that fails."""
+        try:
+            try:
+                self._stream(prompt, names, caller, max_tokens)
+            except Exception as e:
+                log.warning("Streamed case failed: %s", e)
+            with self._cond:
+                data = {**self._invalid, **self._fields}
+            missing = self._too_incomplete(data, names)
+            if missing:
+                # Field repair only sees the case itself, not the settings: rewrite the stage instead
+                raise case_repair.CaseRepairFailed(f"stage is missing {', '.join(missing)}")
+            fields, outcome = repair(data, names, self._minutes)
+        except Exception as e:
+            log.warning("Case repair failed: %s", e)
+            case_repair.count("regenerated")
+            try:
+                fields, outcome = self._regenerate(retry_prompt(), names, caller)
+            except Exception:
+                case_repair.count("failed")
+                raise
+            case_repair.count(outcome, retry=True)
+        else:
+            case_repair.count(outcome)
+        self._publish(fields, names)
+        self._close(names)
+
+    @staticmethod
+    def _too_incomplete(data:dict, names:tuple) -> list:
+        """Required fields missing from a stage, if too many are missing to repair it field by field.
+
+        That is any of ``CORE_FIELDS``, or more than half of the stage's
+        required fields.
+        """
+        required = [n for n in names if OsceCase.model_fields[n].is_required()]
+        missing = [n for n in required if n not in data]
+        if any(n in CORE_FIELDS for n in missing) or len(missing) * 2 > len(required):
+            return missing
+        return []
+
+    def _run(self):
+        names = tuple(f for f in FIELD_TYPES if f not in self._sections)
+        try:
+            with time_budget(CASE_GEN_BUDGET):
+                self._complete(self._template.render(**self._values), names, "case_gen", 2000,
+                               self._retry_prompt)
+            if not self._sections:
+                self._finish()
+                return
+        except Exception as e:
+            self._fail(e)
+            return
+        with self._cond:
+            self._core_done = True
+            start = SECTION_PREFETCH or self._sections_wanted
+        if start:
+            self._start_sections()
+
+    def _retry_prompt(self) -> str:
+        values = dict(self._values)
+        if "chiefComplaint" in self._fields:
+            values["chief"] = self._fields["chiefComplaint"]
+        return self._template.render(**values)
+
+    def _regenerate(self, prompt:str, names:tuple, caller:str) -> tuple:
+        """``(fields, repair outcome)`` of a fresh non-streamed attempt."""
+        with self._cond:
+            shown = {k: v for k, v in self._fields.items() if k in PATIENT_FIELDS}
+        case_data = _generate(prompt, 0.2, caller)
+        case_data.update(shown)
+        return repair(case_data, names, self._minutes)
+
+    def _start_sections(self):
+        with self._cond:
+            if self._sections_started:
+                return
+            self._sections_started = True
+        threading.Thread(target=self._run_sections, name="case-sections", daemon=True).start()
+
+    def _run_sections(self):
+        with self._cond:
+            core = {k: v for k, v in self._fields.items() if k not in self._sections}
+        prompt = SECTIONS_PROMPT.render(case=prompts.minify_json(core))
+        unavailable = ()
+        try:
+            with time_budget(CASE_GEN_BUDGET):
+                self._complete(prompt, self._sections, "case_gen_sections", 1500, lambda: prompt)
+        except Exception as e:
+            with self._cond:
+                unavailable = tuple(n for n in self._sections if n not in self._fields)
+            log.error("Case sections %s failed, finishing the case without them: %s",
+                      ", ".join(unavailable), e)
+        try:
+            self._finish(unavailable)
+        except Exception as e:
+            self._fail(e)
+
+    def _finish(self, unavailable:tuple=()):
+        with self._cond:
+            case_data = dict(self._fields)
+        case_data.update({n: UNAVAILABLE_SECTIONS[n] for n in unavailable})
+        case = _build_case(case_data, self.lang)
+        with self._cond:
+            self._case = case
+            self.unavailable = unavailable
+            self.total_s = time.perf_counter() - self._started
+            self._cond.notify_all()
+        log.info("Case generated in %.2f seconds (streamed)", self.total_s)
+
+    def _fail(self, error:Exception):
+        log.error("Case generation failed: %s", error)
+        with self._cond:
+            self._error = error
+            self._cond.notify_all()
+
+    def _want_sections(self):
+        """A deferred section was asked for; start writing them if that hasn't happened yet."""
+        with self._cond:
+            self._sections_wanted = True
+            start = self._core_done
+        if start:
+            self._start_sections()
+
+    def done(self) -> bool:
+        return self._case is not None or self._error is not None
+
+    def succeeded(self) -> bool:
+        """Finished with every section written."""
+        return self._case is not None and not self.unavailable
+
+    def available(self, name:str) -> bool:
+        """Wait for field ``name``; False if it could not be generated.  Never raises."""
+        if name in self._sections:
+            self._want_sections()
+        with self._cond:
+            self._cond.wait_for(lambda: self.done() or name in self._fields)
+            return name not in self.unavailable and (self._case is not None or name in self._fields)
+
+    def has(self, name:str) -> bool:
+        return self._case is not None or name in self._fields
+
+    def wait_for(self, *names:str, timeout:float|None=None) -> bool:
+        """Wait until ``names`` have arrived; False on timeout.
+
+        Re-raises the generation error if the case failed before then.
+        """
+        if any(n in self._sections for n in names):
+            self._want_sections()
+        with self._cond:
+            self._cond.wait_for(lambda: self.done() or all(n in self._fields for n in names), timeout)
+            if self._case is None and not all(n in self._fields for n in names):
+                if self._error is not None:
+                    raise self._error
+                return False
+        return True
+
+    def result(self, timeout:float|None=None) -> OsceCase:
+        """The validated case, waiting for every section to be written.
+
+        Sections listed in ``unavailable`` hold their stand-ins; only a
+        failure of the core case raises.
+        """
+        self._want_sections()
+        with self._cond:
+            if not self._cond.wait_for(self.done, timeout):
+                raise TimeoutError("case is still being generated")
+            if self._error is not None:
+                raise self._error
+            return self._case
+
+    def _patient_ready(self) -> bool:
+        if self.done():
+            return True
+        return all(f in self._fields or (f in self._closed and not OsceCase.model_fields[f].is_required())
+                   for f in PATIENT_FIELDS)
+
+    def patient_case(self) -> dict:
+        """Case dict for ``app.core.patient``, as soon as the patient's own fields are in.
+
+        Optional fields (personality, backstory) that never streamed in, or
+        that are still being repaired, take their schema defaults once the
+        core object has closed.  Never raises: if generation failed the
+        patient answers from the fields that did arrive.
+        """
+        with self._cond:
+            self._cond.wait_for(self._patient_ready)
+            if self._case is not None:
+                return self._case.model_dump()
+            fields = dict(self._fields)
+            if self._error is not None:
+                log.warning("Patient uses a partial case: %s", self._error)
+        for name in PATIENT_FIELDS:
+            field = OsceCase.model_fields[name]
+            if name not in fields and not field.is_required():
+                fields[name] = FIELD_TYPES[name].dump_python(field.get_default(call_default_factory=True))
+        fields["lang"] = self.lang
+        return fields
+
+    def __getattr__(self, name:str):
+        if name.startswith("_"):
+            raise AttributeError(name)
+        if name in FIELD_TYPES:
+            self.wait_for(name)
+            if self._case is None:
+                return FIELD_TYPES[name].validate_python(self._fields[name])
+        return getattr(self.result(), name)
+
+def stream_case(
+    lang:str="en",
+    chief_override:str|None=None,
+    settings:dict=None,
+    use_pool:bool|None=None,
+    lazy:bool|None=None
+) -> OsceCase | StreamingCase:
+    """Start generating a case and return without waiting for it.
+
+    Takes the same arguments as ``generate_case``.  Pooled cases are
+    returned as they are; live ones as a ``StreamingCase`` - wait for
+    ``CORE_FIELDS`` before showing the station.  ``lazy`` (default
+    ``OSCE_LAZY_SECTIONS``) defers ``DEFERRED_SECTIONS`` to a second call.
+    """
+    pooled, lang, values = _case_request(lang, chief_override, settings, use_pool)
+    if pooled is not None:
+        return pooled
+    return StreamingCase(lang, values, LAZY_SECTIONS if lazy is None else lazy, settings.get("minutes"))
+
+def section_available(case, name:str) -> bool:
+    """False if field ``name`` of a station could not be generated (waits for a streamed one)."""
+    return case.available(name) if isinstance(case, StreamingCase) else True
+
+def checkout_pooled_case(key:tuple, **patient) -> OsceCase | None:
+    """Pop a case for ``key`` from the pool (``patient``: see ``rerandomize_patient``).
+
+    For the random partition the settings are random anyway, so if it is
+    empty any other stocked partition in the same language will do.  Either
+    way the key is watched so the filler stocks it for next time.
+    """
+    pool = get_pool()
+    get_filler().watch(key)
+    case = pool.checkout(key, **patient)
+    if case is None and key == random_pool_key(key[-1]):
+        others = [k for k in pool.keys() if k[-1] == key[-1] and k != key and pool.count(k)]
+        random.shuffle(others)
+        for other in others:
+            case = pool.checkout(other)
+            if case is not None:
+                break
+    log.debug("Case pool %s for %s", "hit" if case is not None else "miss", key)
+    return case
+
+def generate_random_case(category:str, difficulty:int, station_type:str, gender:str, lang:str) -> OsceCase:
+    """Generate a live case for one pool partition with a random patient, at background priority.
+
+    For a ``random_pool_key`` partition the settings are drawn at random too.
+    """
+    if category == ANY:
+        category = random.choice(RANDOM_CATEGORIES)
+        difficulty = random.randint(1, 5)
+        station_type = random.choice(STATION_TYPES)
+    if gender == ANY:
+        gender = random.choice(GENDERS)
+    return generate_case(
+        lang=lang,
+        settings=dict(
+            category=category,
+            difficulty=difficulty,
+            station_type=station_type,
+            language=lang,
+            age=random.randint(18, 90),
+            gender=gender,
+            occupation=random.choice(OCCUPATIONS),
+            fully_random=False
+        ),
+        use_pool=False,
+        caller="pool_fill"
+    )
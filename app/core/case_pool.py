@@ -0,0 +1,207 @@
+"""
+Persistent pool of pre-generated OSCE cases.
+Validated cases are stored as JSON files on disk, partitioned by
+(category, difficulty, station_type, gender, language).  Fully random
+cases, where any settings will do, share one partition per language
+(``random_pool_key``).
+A background filler keeps every partition that has been asked for above a
+low-water mark, so most exams can start from the pool instead of waiting on
+the LLM; its calls run at background priority (caller "pool_fill").
+Usage:
+    from app.core.case_pool import get_pool, random_pool_key
+    case = get_pool().checkout(random_pool_key("en"))
+"""
+import json
+import logging
+import os
+import random
+import re
+import threading
+import uuid
+from app.core.schema import OsceCase
+from app.core.name_utils import generate_name
+
+log = logging.getLogger(__name__)
+
+POOL_DIR   = os.getenv("OSCE_CASE_POOL_DIR", ".case_pool")
+LOW_WATER  = int(os.getenv("OSCE_CASE_POOL_LOW_WATER", "3"))    # refill below this
+HIGH_WATER = int(os.getenv("OSCE_CASE_POOL_HIGH_WATER", "6"))   # ...up to this
+FILL_INTERVAL = 30.0                                            # seconds between sweeps
+
+ANY = "any"                 # category/station type of the fully random partitions
+
+def pool_key(category:str, difficulty:int, station_type:str, gender:str, lang:str) -> tuple:
+    """Partition key for a set of case settings (the language is always last)."""
+    return (category, int(difficulty), station_type, gender, lang)
+
+def random_pool_key(lang:str) -> tuple:
+    """The one partition of fully random cases for a language."""
+    return pool_key(ANY, 0, ANY, ANY, lang)
+
+def _slug(key:tuple) -> str:
+    return "__".join(re.sub(r"[^a-z0-9]+", "-", str(part).lower()).strip("-") for part in key)
+
+def rerandomize_patient(text:str, age:int|None=None, occupation:str|None=None) -> OsceCase:
+    """Give a pooled case (its stored JSON) a fresh patient name and a nearby age.
+
+    The name is redrawn through ``generate_name`` and replaced everywhere it
+    appears in the case text.  Gender is kept: the pooled history, exam and
+    answer key were written for it.  ``age`` and ``occupation`` replace the
+    patient's when a custom case asked for them.  The edited text is
+    validated once.
+    """
+    data = json.loads(text)                 # only to read the patient; validated below
+    info = data["patientInfo"]
+    old_name, old_age = info["name"], int(info["age"])
+    new_name = generate_name(info["gender"], data.get("lang", "en"))
+    new_age = age if age is not None else min(95, max(18, old_age + random.randint(-3, 3)))
+
+    if old_name and old_name != new_name:
+        text = text.replace(old_name, new_name)
+        old_first, new_first = old_name.split()[0], new_name.split()[0]
+        # Word boundaries written as a trailing lookbehind, so the literal leads and the scan is fast
+        first = re.escape(old_first)
+        text = re.sub(rf"{first}\b(?<!\w{first})", new_first, text)
+    text = re.sub(rf"{old_age}(?=[- ]year)(?<!\w{old_age})", str(new_age), text)
+    # PatientInfo is flat, so its object has no nested braces
+    text = re.sub(r'("patientInfo"\s*:\s*\{[^{}]*"age"\s*:\s*)\d+', rf"\g<1>{new_age}", text, count=1)
+    old_occupation = info["occupation"]
+    if occupation and old_occupation and occupation != old_occupation:
+        escaped = json.dumps(occupation, ensure_ascii=False)[1:-1]     # it goes inside JSON strings
+        text = re.sub(rf"(?<!\w){re.escape(old_occupation)}(?!\w)", lambda m: escaped, text)
+    return OsceCase.model_validate_json(text)
+
+class CasePool:
+    """Directory-backed store of validated cases, one JSON file per case."""
+
+    def __init__(self, root:str=POOL_DIR):
+        self.root = root
+
+    def _dir(self, key:tuple) -> str:
+        return os.path.join(self.root, _slug(key))
+
+    def _files(self, key:tuple) -> list:
+        try:
+            return sorted(f for f in os.listdir(self._dir(key)) if f.endswith(".json") and f != "key.json")
+        except FileNotFoundError:
+            return []
+
+    def count(self, key:tuple) -> int:
+        return len(self._files(key))
+
+    def keys(self) -> list:
+        """All partitions that exist on disk."""
+        keys = []
+        if not os.path.isdir(self.root):
+            return keys
+        for d in os.listdir(self.root):
+            try:
+                with open(os.path.join(self.root, d, "key.json")) as f:
+                    keys.append(tuple(json.load(f)))
+            except (OSError, ValueError):
+                continue
+        return keys
+
+    def put(self, key:tuple, case:OsceCase) -> str:
+        """Store a validated case; the write is atomic."""
+        d = self._dir(key)
+        os.makedirs(d, exist_ok=True)
+        meta = os.path.join(d, "key.json")
+        if not os.path.exists(meta):
+            with open(meta, "w") as f:
+                json.dump(list(key), f)
+        path = os.path.join(d, f"{uuid.uuid4().hex}.json")
+        tmp = path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            f.write(case.model_dump_json())
+        os.replace(tmp, path)
+        return path
+
+    def checkout(self, key:tuple, **patient) -> OsceCase | None:
+        """Pop one case from a partition, or None if it's empty.
+
+        A case is claimed by renaming its file first, so two sessions (or two
+        server processes) never get the same one.  ``patient`` is passed on
+        to ``rerandomize_patient``.
+        """
+        d = self._dir(key)
+        for name in self._files(key):
+            src = os.path.join(d, name)
+            claimed = src + f".{uuid.uuid4().hex}.claimed"
+            try:
+                os.rename(src, claimed)
+            except OSError:
+                continue                            # somebody else got it
+            try:
+                with open(claimed, encoding="utf-8") as f:
+                    case = rerandomize_patient(f.read(), **patient)
+            except Exception as e:
+                log.warning("Dropping unreadable pooled case %s: %s", name, e)
+                case = None
+            finally:
+                os.remove(claimed)
+            if case is not None:
+                get_filler().notify(key)
+                return case
+        return None
+
+class PoolFiller(threading.Thread):
+    """Keeps watched partitions between LOW_WATER and HIGH_WATER."""
+
+    def __init__(self, pool:CasePool):
+        super().__init__(name="case-pool-filler", daemon=True)
+        self.pool = pool
+        # The random partition of every language on disk; a settings partition once it's asked for again
+        self._watched = {random_pool_key(k[-1]) for k in pool.keys()}
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+
+    def watch(self, key:tuple):
+        with self._lock:
+            self._watched.add(key)
+        self._wake.set()
+
+    def notify(self, key:tuple):
+        """Called after a checkout so a drained partition is refilled promptly."""
+        if self.pool.count(key) < LOW_WATER:
+            self.watch(key)
+
+    def fill(self, key:tuple):
+        # Imported here: case_generator itself checks the pool out
+        from app.core.case_generator import generate_random_case
+        while self.pool.count(key) < HIGH_WATER:
+            self.pool.put(key, generate_random_case(*key))
+
+    def run(self):
+        while True:
+            with self._lock:
+                keys = list(self._watched)
+            for key in keys:
+                if self.pool.count(key) < LOW_WATER:
+                    try:
+                        self.fill(key)
+                    except Exception as e:
+                        log.warning("Case pool fill for %s failed: %s", key, e)
+            self._wake.wait(FILL_INTERVAL)
+            self._wake.clear()
+
+_pool = None
+_filler = None
+_init_lock = threading.Lock()
+
+def get_pool() -> CasePool:
+    global _pool
+    with _init_lock:
+        if _pool is None:
+            _pool = CasePool()
+        return _pool
+
+def get_filler() -> PoolFiller:
+    """Process-wide filler thread, started on first use."""
+    global _filler
+    pool = get_pool()
+    with _init_lock:
+        if _filler is None:
+            _filler = PoolFiller(pool)
+            _filler.start()
+        return _filler
@@ -0,0 +1,227 @@
+"""
+Field-level repair of generated cases.
+Each top-level field is validated on its own and the pydantic error paths
+say what is wrong where.  Common slips are fixed locally (a string where a
+list belongs, an empty list, a missing key list, an off-list personality
+trait, instructions without "Time allowed:"); only fields that are still
+invalid go back to the LLM, in a prompt that asks for just those fields.
+Callers count outcomes (including full regenerations) with ``count``,
+kept in ``app.core.telemetry`` as ``case_repairs``.
+Usage:
+    from app.core import case_repair
+    fields, outcome = case_repair.repair(data, names, minutes=8)   # "valid", "local" or "llm"
+    case_repair.count(outcome)
+"""
+import copy
+import json
+import logging
+import re
+from pydantic import TypeAdapter, ValidationError
+from app.core.llm import chat
+from app.core.schema import OsceCase
+from app.core import prompts, telemetry
+from app.core import CASE_GEN_MODEL
+
+log = logging.getLogger(__name__)
+
+# The allowed values the case prompt lists (rules 6 and 7)
+TRAITS = ("chatty", "terse", "irritable", "anxious", "optimistic", "reserved", "humorous", "skeptical", "dramatic")
+COPING_STYLES = ("stoical", "denial", "humor", "anger", "bargaining", "research-focused", "spiritual", "avoidance")
+
+DEFAULT_KEY_LISTS = {
+    "keyHistoryQuestions": ["Take a detailed history of the presenting complaint"],
+    "keyExamManeuvers": ["Perform a relevant physical examination"],
+}
+
+OUTCOMES = ("valid", "local", "llm", "regenerated", "failed")
+# How a regenerated case came out; "failed" is when the retry didn't validate either
+RETRY_OUTCOMES = ("retry_valid", "retry_local", "retry_llm")
+
+# Validators for single top-level fields
+FIELD_TYPES = {name: TypeAdapter(f.annotation) for name, f in OsceCase.model_fields.items()}
+
+class CaseRepairFailed(ValueError):
+    """Fields still invalid after local and LLM repair."""
+
+def schema_subset(names:tuple) -> dict:
+    """The OsceCase schema restricted to the fields in ``names``."""
+    schema = OsceCase.model_json_schema()
+    props = {k: v for k, v in schema["properties"].items() if k in names}
+    used = json.dumps(props)
+    out = dict(schema, properties=props, required=[k for k in schema["required"] if k in names])
+    if "$defs" in schema:
+        out["$defs"] = {k: v for k, v in schema["$defs"].items() if f"#/$defs/{k}" in used}
+    return out
+
+REPAIR_TEMPLATE = """
+Some fields of a generated OSCE case failed validation. Rewrite ONLY those fields
+as one JSON object matching this schema, keeping them consistent with the rest of the case.
+
+RULES:
+1. Output ONLY JSON with no explanations or markdown
+2. Never leave any list empty; if truly N/A, write ["None"]
+3. Write in the case's language
+
+SCHEMA:
+{schema}
+
+FIELDS: {fields}
+
+ERRORS:
+{errors}
+
+REST OF THE CASE:
+{case}
+"""
+REPAIR_PROMPT = prompts.register("case_repair", REPAIR_TEMPLATE)
+
+def field_errors(data:dict, names:tuple) -> dict:
+    """Pydantic errors per field in ``names``, with paths relative to the case."""
+    out = {}
+    for name in names:
+        if name not in data:
+            if OsceCase.model_fields[name].is_required():
+                out[name] = [{"type": "missing", "loc": (name,), "msg": "Field required"}]
+            continue
+        try:
+            FIELD_TYPES[name].validate_python(data[name])
+        except ValidationError as e:
+            out[name] = [dict(err, loc=(name,) + tuple(err["loc"])) for err in e.errors()]
+    return out
+
+def _fix_error(data:dict, err:dict) -> bool:
+    """Fix one error at its path if it's a known slip; True if anything changed."""
+    *path, key = err["loc"]
+    parent = data
+    for part in path:
+        parent = parent[part]
+    kind = err["type"]
+    if kind == "missing" and key in DEFAULT_KEY_LISTS and parent is data:
+        data[key] = list(DEFAULT_KEY_LISTS[key])
+    elif kind == "extra_forbidden":
+        del parent[key]
+    elif kind == "list_type" and isinstance(parent[key], str):
+        parent[key] = [parent[key]]
+    elif kind == "list_type" and parent[key] is None:
+        parent[key] = ["None"]
+    elif kind == "string_type" and isinstance(parent[key], list) and all(isinstance(v, str) for v in parent[key]):
+        parent[key] = "; ".join(parent[key])
+    elif kind == "int_parsing" and isinstance(parent[key], str) and re.search(r"\d+", parent[key]):
+        parent[key] = int(re.search(r"\d+", parent[key]).group())
+    else:
+        return False
+    return True
+
+def _fill_empty(value):
+    """Replace empty lists, at any depth, with ``["None"]``."""
+    if isinstance(value, list):
+        return [_fill_empty(v) for v in value] if value else ["None"]
+    if isinstance(value, dict):
+        return {k: _fill_empty(v) for k, v in value.items()}
+    return value
+
+def _closest(value, allowed:tuple, default:str) -> str:
+    text = str(value).strip().lower()
+    if text in allowed:
+        return text
+    return next((a for a in allowed if a in text or text in a), default) if text else default
+
+def fix_locally(data:dict, names:tuple, minutes:int|None=None) -> list:
+    """Apply every local fix to the fields in ``names`` in place; returns the fields changed."""
+    changed = set()
+    for name, errors in field_errors(data, names).items():
+        for err in errors:
+            try:
+                if _fix_error(data, err):
+                    changed.add(name)
+            except (KeyError, IndexError, TypeError):
+                pass
+    # Rules from the case prompt that the schema itself doesn't enforce
+    for name in names:
+        if name in data and _fill_empty(data[name]) != data[name]:
+            data[name] = _fill_empty(data[name])
+            changed.add(name)
+    personality = data.get("personality")
+    if "personality" in names and isinstance(personality, dict):
+        fixed = dict(personality,
+                     trait=_closest(personality.get("trait", ""), TRAITS, "chatty"),
+                     coping_style=_closest(personality.get("coping_style", ""), COPING_STYLES, "stoical"))
+        if fixed != personality:
+            data["personality"] = fixed
+            changed.add("personality")
+    text = data.get("candidate_instructions")
+    if "candidate_instructions" in names and isinstance(text, str) and text.strip():
+        fixed = text.strip()
+        if not fixed.startswith("Time allowed:"):
+            allowed = f"{minutes} minutes" if minutes else "see the station timer"
+            fixed = f"Time allowed: {allowed}. {fixed}"
+        if not fixed.endswith("Good luck."):
+            fixed += " Good luck."
+        if fixed != text:
+            data["candidate_instructions"] = fixed
+            changed.add("candidate_instructions")
+    return sorted(changed)
+
+def _llm_repair(data:dict, errors:dict, caller:str) -> dict:
+    names = tuple(errors)
+    context = {k: v for k, v in data.items() if k not in names and k != "marking_sheet"}
+    prompt = REPAIR_PROMPT.render(
+        schema=prompts.minify_schema(schema_subset(names)),
+        fields=", ".join(names),
+        errors="\n".join(f"- {'.'.join(map(str, e['loc']))}: {e['msg']}" for errs in errors.values() for e in errs),
+        case=prompts.minify_json(context),
+    )
+    raw = chat(
+        [{"role":"system","content": prompt}],
+        model=CASE_GEN_MODEL,
+        json_mode=True,
+        temperature=0.2,
+        max_tokens=300 + 200 * len(names),
+        caller=caller
+    )
+    fixed = json.loads(raw)
+    return {k: v for k, v in fixed.items() if k in names}
+
+def repair(data:dict, names:tuple, minutes:int|None=None, caller:str="case_gen_repair") -> tuple:
+    """Make the fields ``names`` of ``data`` valid.
+
+    Returns ``(fields, outcome)``: the repaired fields and whether they were
+    already "valid", fixed "local"ly or needed an "llm" call.  Raises
+    ``CaseRepairFailed`` if they still don't validate.
+    """
+    data = copy.deepcopy(data)
+    changed = fix_locally(data, names, minutes)
+    errors = field_errors(data, names)
+    outcome = "local" if changed else "valid"
+    if errors:
+        log.info("Asking the LLM to repair case fields %s", ", ".join(errors))
+        data.update(_llm_repair(data, errors, caller))
+        changed += fix_locally(data, tuple(errors), minutes)
+        errors = field_errors(data, names)
+        outcome = "llm"
+    if errors:
+        raise CaseRepairFailed(f"case fields still invalid after repair: {', '.join(errors)}")
+    if changed:
+        log.info("Repaired case fields %s (%s)", ", ".join(sorted(set(changed))), outcome)
+    return {k: data[k] for k in names if k in data}, outcome
+
+def count(outcome:str, retry:bool=False):
+    """Record how a generated case was made valid (one of ``OUTCOMES``).
+
+    With ``retry`` the outcome is that of the regenerated case, counted
+    apart so it doesn't inflate the first attempt's repair rate.
+    """
+    telemetry.count("case_repairs", f"retry_{outcome}" if retry and outcome in ("valid", "local", "llm") else outcome)
+
+def repair_stats() -> dict:
+    """Outcome counts, and the share of invalid cases fixed by repair rather than regenerated.
+
+    Every "regenerated" is followed by one retry outcome or "failed";
+    ``retry_ok`` is how many of those retries produced a valid case.
+    """
+    counts = telemetry.counters().get("case_repairs", {})
+    counts = {o: counts.get(o, 0) for o in OUTCOMES + RETRY_OUTCOMES}
+    invalid = counts["local"] + counts["llm"] + counts["regenerated"]
+    return dict(counts,
+                retry_ok=sum(counts[o] for o in RETRY_OUTCOMES),
+                repair_rate=round((counts["local"] + counts["llm"]) / invalid, 3) if invalid else 0.0)
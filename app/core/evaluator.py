@@ -1,8 +1,17 @@
 import json
+import os
 import random
-from app.core import EVAL_MODEL, SCORING_MODEL
+import re
+import hashlib
+import logging
+from app.core import EVAL_MODEL, SCORING_MODEL, FALLBACK_MODEL
 from app.core.llm import chat
 from app.core.checklist import CHECKLIST_ITEMS
+from app.core.cache import CACHE_DIR, LRUCache, SQLiteCache, TieredCache, make_key
+from app.core.resilience import time_budget, SCORING_BUDGET
+from app.core import prompts
+
+log = logging.getLogger(__name__)
 
 def collapse_transcript(raw: str, limit: int = 40) -> str:
     """Turn long chat into ≤limit bulleted lines so the model can reason."""
@@ -11,7 +20,7 @@ def collapse_transcript(raw: str, limit: int = 40) -> str:
         out.append(line.strip())
         if len(out) >= limit:
             break
-    print(f"DEBUG: Processed transcript with {len(out)} lines")
+    log.debug("Processed transcript with %d lines", len(out))
     return "\n".join(out)
 
 REASON_TEMPLATE = """
@@ -52,6 +61,46 @@ NOTES
 {notes}
 """
 
+SCORING_ERROR_COMMENT = "The scoring process encountered issues. Please review the transcript manually."
+
+# How stations are graded: "incremental" (marked during the station by IncrementalScorer,
+# falling back to "two_stage"), or from the whole transcript at the end with "two_stage"
+# (reasoning notes, then JSON conversion) or "single_pass" (one call, parsed locally)
+SCORING_MODE = os.getenv("OSCE_SCORING_MODE", "incremental")
+TRANSCRIPT_MODES = ("two_stage", "single_pass")
+
+# Single call that writes the result straight in a compact line format
+SINGLE_PASS_TEMPLATE = """
+You are an OSCE examiner.  Score every checklist item below:
+0 = not done, 3 = partially done, 5 = done well.
+
+Write exactly one line per item in this form:
+<item number>|<score>|<comment of at most 15 words>
+
+For items scored 0, the comment must say WHY it was absent, not just "absent".
+
+Then write two final lines:
+DX|<integer 0-5 for the student's diagnosis>
+COMMENTS|<overall assessment in 2-3 sentences>
+
+Example:
+1|5|Greets patient warmly, introduces self
+10|3|Asked about drug history but missed allergies
+11|0|Did not ask about family health history at all
+
+Checklist:
+{checklist}
+
+Conversation (bullet summary):
+{summary}
+
+Student's stated diagnosis: {dx}
+
+-----  WRITE {n_lines} LINES, NOTHING ELSE  -----
+"""
+
+_LINE_RE = re.compile(r"^\s*(\d+)\s*[.)]?\s*\|\s*(\d+)\s*\|\s*(.*?)\s*$")
+
 # Used for direct scoring of very short transcripts
 DIRECT_SCORING_TEMPLATE = """
 You are an OSCE examiner scoring a medical student's clinical examination.
@@ -70,12 +119,12 @@ The output should be a JSON object with these fields:
 - comments: Overall assessment
 - diagnosis_score: Integer from 0-5
 
-TRANSCRIPT:
-{transcript}
-
 CHECKLIST ITEMS:
 {checklist}
 
+TRANSCRIPT:
+{transcript}
+
 STUDENT DIAGNOSIS:
 {dx}
 """
@@ -101,10 +150,42 @@ _SCHEMA = {
     "additionalProperties": False
 }
 
+# One-stage fallback when the main scoring path fails
+FALLBACK_SYSTEM = (
+    "You are an OSCE examiner evaluating a medical student's performance.\n"
+    "Score each checklist item on a scale of 0 (not done), 3 (partially done), or 5 (done well).\n"
+    "Output JSON only, matching the provided schema.\n"
+    "IMPORTANT: Only mark items as 0 (absent) if they are truly not addressed in the conversation.\n"
+    "IMPORTANT: Give credit (score 3 or 5) for ANY attempt to address checklist items, even if brief."
+)
+FALLBACK_TEMPLATE = """Checklist items:
+{checklist}
+
+Schema:
+{schema}
+
+Conversation:
+{summary}
+
+Student diagnosis: {dx}"""
+
+# Static parts (checklist, schema) are filled in once here
+_CHECKLIST_LINES = "\n".join(CHECKLIST_ITEMS)
+_CHECKLIST_NUMBERED = "\n".join(f"{i}. {item}" for i, item in enumerate(CHECKLIST_ITEMS, 1))
+_SCHEMA_STR = prompts.minify_json(_SCHEMA)
+REASON_PROMPT = prompts.register("scoring_reason", REASON_TEMPLATE, checklist=_CHECKLIST_LINES)
+JSON_PROMPT = prompts.register("scoring_json", JSON_TEMPLATE, schema=_SCHEMA_STR)
+SINGLE_PASS_PROMPT = prompts.register("scoring_single_pass", SINGLE_PASS_TEMPLATE,
+                                      checklist=_CHECKLIST_NUMBERED, n_lines=len(CHECKLIST_ITEMS) + 2)
+DIRECT_SCORING_PROMPT = prompts.register("scoring_direct", DIRECT_SCORING_TEMPLATE,
+                                         checklist=prompts.minify_json(CHECKLIST_ITEMS))
+FALLBACK_PROMPT = prompts.register("scoring_fallback", FALLBACK_TEMPLATE,
+                                   checklist=prompts.minify_json(CHECKLIST_ITEMS), schema=_SCHEMA_STR)
+
 def normalize_array(arr, expected_len, default_value):
     """Ensure array is exactly expected_len by padding or truncating"""
     if len(arr) < expected_len:
-        print(f"DEBUG: Normalizing array from {len(arr)} to {expected_len} items")
+        log.debug("Normalizing array from %d to %d items", len(arr), expected_len)
         return arr + [default_value] * (expected_len - len(arr))
     else:
         return arr[:expected_len]
@@ -126,8 +207,118 @@ def validate_scores(scores, expected_len):
             validated.append(0)
     return validated
 
-def score(transcript: str, candidate_dx: str = "") -> dict:
-    """Evaluate a clinical interaction"""
+def parse_line_scores(text: str) -> dict:
+    """Parse ``idx|score|comment`` lines (plus DX/COMMENTS) into the _SCHEMA shape.
+
+    Raises ValueError if fewer than half of the items could be read, so the
+    caller can fall back to another scoring method.
+    """
+    expected = len(CHECKLIST_ITEMS)
+    scores = [0] * expected
+    item_comments = ["Not assessed"] * expected
+    seen = 0
+    diagnosis_score = 0
+    comments = "Evaluation of student performance completed."
+    for line in text.splitlines():
+        head, _, rest = line.partition("|")
+        tag = head.strip().upper()
+        if tag == "DX":
+            digits = re.search(r"\d+", rest)
+            diagnosis_score = int(digits.group()) if digits else 0
+            continue
+        if tag == "COMMENTS":
+            comments = rest.strip() or comments
+            continue
+        m = _LINE_RE.match(line)
+        if not m:
+            continue
+        idx = int(m.group(1)) - 1
+        if 0 <= idx < expected:
+            scores[idx] = int(m.group(2))
+            item_comments[idx] = m.group(3) or item_comments[idx]
+            seen += 1
+    if seen < expected // 2:
+        raise ValueError(f"only {seen}/{expected} checklist lines could be parsed")
+    return {
+        "scores": scores,
+        "item_comments": item_comments,
+        "comments": comments,
+        "diagnosis_score": diagnosis_score
+    }
+
+def score_single_pass(summary: str, dx: str) -> dict:
+    """One SCORING_MODEL call, parsed locally instead of by a second LLM."""
+    notes = chat(
+        [{"role":"user",
+          "content": SINGLE_PASS_PROMPT.render(summary=summary, dx=dx)}],
+        model=SCORING_MODEL,
+        temperature=0.2,
+        max_tokens=1100,
+        caller="scoring_single_pass")
+    return parse_line_scores(notes)
+
+# Memoized results: identical transcript + diagnosis + checklist + models + prompts
+SCORE_CACHE_ENABLED = os.getenv("OSCE_SCORE_CACHE", "1") == "1"
+SCORE_CACHE_TTL = float(os.getenv("OSCE_SCORE_CACHE_TTL", str(7 * 24 * 3600)))   # seconds
+EMPTY_DIAGNOSES = ["none", "n/a", "na", "unknown", "not sure", "don't know", "i don't know"]
+
+CHECKLIST_VERSION = hashlib.sha256("\n".join(CHECKLIST_ITEMS).encode()).hexdigest()[:12]
+PROMPT_VERSION = hashlib.sha256("".join([
+    REASON_TEMPLATE, JSON_TEMPLATE, DIRECT_SCORING_TEMPLATE, SINGLE_PASS_TEMPLATE,
+    FALLBACK_SYSTEM, FALLBACK_TEMPLATE
+]).encode()).hexdigest()[:12]
+
+_score_cache = TieredCache(
+    LRUCache(max_entries=256, ttl=SCORE_CACHE_TTL),
+    SQLiteCache(os.path.join(CACHE_DIR, "score_cache.sqlite3"), max_entries=5000, ttl=SCORE_CACHE_TTL)
+) if SCORE_CACHE_ENABLED else None
+
+def score_cache_key(transcript: str, candidate_dx: str, mode: str, case: str = "") -> str:
+    """Content address of a scoring request (``case``: answer key text, if the prompt gets one)."""
+    lines = [" ".join(line.split()) for line in transcript.strip().splitlines()]
+    dx = " ".join((candidate_dx or "").lower().split())
+    return make_key({
+        "transcript": [line for line in lines if line],
+        "dx": "" if dx in EMPTY_DIAGNOSES else dx,
+        "checklist": CHECKLIST_VERSION,
+        "models": [SCORING_MODEL, EVAL_MODEL, FALLBACK_MODEL],
+        "prompts": PROMPT_VERSION,
+        "mode": mode,
+        "case": case
+    })
+
+def score_cache_stats() -> dict:
+    return _score_cache.stats() if _score_cache is not None else {}
+
+def memoized_score(key: str, candidate_dx: str, compute) -> dict:
+    """``compute()``, or the stored result for ``key``; failures are never stored."""
+    if _score_cache is None:
+        return compute()
+    
+    hit, cached = _score_cache.get(key)
+    if hit:
+        log.debug("Score cache hit")
+        return dict(cached, candidate_dx=candidate_dx)
+    
+    result = compute()
+    # Never memoize a failure; the next attempt might succeed
+    if not result.get("scoring_failed") and result.get("comments") != SCORING_ERROR_COMMENT:
+        _score_cache.set(key, result)
+    return result
+
+def score(transcript: str, candidate_dx: str = "", mode: str | None = None) -> dict:
+    """Evaluate a clinical interaction
+
+    ``mode`` picks the main scoring path: "two_stage" or "single_pass"
+    (default: SCORING_MODE if it is one of them).  Results are memoized by
+    content, so re-grading an identical transcript returns immediately.
+    """
+    mode = mode or (SCORING_MODE if SCORING_MODE in TRANSCRIPT_MODES else "two_stage")
+    return memoized_score(score_cache_key(transcript, candidate_dx, mode), candidate_dx,
+                          lambda: _score_uncached(transcript, candidate_dx, mode))
+
+@time_budget(SCORING_BUDGET)            # every scoring path and fallback shares one budget
+def _score_uncached(transcript: str, candidate_dx: str, mode: str) -> dict:
     # Normalize diagnosis
     normalized_dx = candidate_dx.strip() if candidate_dx else ""
     
@@ -135,23 +326,23 @@ def score(transcript: str, candidate_dx: str = "") -> dict:
     is_empty_diagnosis = not normalized_dx or normalized_dx.lower() in ["none", "n/a", "na", "unknown", "not sure", "don't know", "i don't know"]
     
     # Debug the transcript format
-    print(f"DEBUG: Full transcript length: {len(transcript.splitlines())} lines")
-    print(f"DEBUG: First 3 lines of transcript: {transcript.splitlines()[:3]}")
+    log.debug("Full transcript length: %d lines", len(transcript.splitlines()))
+    log.debug("First 3 lines of transcript: %s", transcript.splitlines()[:3])
     
     # Handle very short or empty transcripts - quick path
     lines = transcript.strip().splitlines()
     if len(lines) < 5:
-        print("DEBUG: Very short transcript detected - using direct scoring template")
+        log.debug("Very short transcript detected - using direct scoring template")
         try:
             json_block = chat(
-                [{"role":"user", "content": DIRECT_SCORING_TEMPLATE.format(
+                [{"role":"user", "content": DIRECT_SCORING_PROMPT.render(
                     transcript=transcript,
-                    checklist=json.dumps(CHECKLIST_ITEMS),
                     dx=normalized_dx
                 )}],
                 model=EVAL_MODEL,
                 json_mode=True,
-                temperature=0.1
+                temperature=0.1,
+                caller="scoring_direct"
             )
             data = json.loads(json_block)
             
@@ -161,44 +352,46 @@ def score(transcript: str, candidate_dx: str = "") -> dict:
                 
             return process_scoring_data(data, candidate_dx)
         except Exception as e:
-            print(f"DEBUG: Direct scoring failed: {str(e)}")
+            log.warning("Direct scoring failed: %s", e)
     
     # Regular two-stage path for normal transcripts
     summary = collapse_transcript(transcript)
-    print(f"DEBUG: Transcript length: {len(summary.splitlines())} lines")
+    log.debug("Transcript length: %d lines", len(summary.splitlines()))
     
     try:
+        if mode == "single_pass":
+            data = score_single_pass(summary, normalized_dx)
+            log.debug("Single-pass scores: %s", data["scores"])
+            if is_empty_diagnosis:
+                data["diagnosis_score"] = 0
+            return process_scoring_data(data, candidate_dx)
+        
         # Stage 1: Reasoning with SCORING_MODEL (GPT-4.1-mini)
         reasoning = chat(
             [{"role":"user",
-              "content": REASON_TEMPLATE.format(
-                  checklist="\n".join(CHECKLIST_ITEMS),
-                  summary=summary,
-                  dx=normalized_dx
-              )}],
+              "content": REASON_PROMPT.render(summary=summary, dx=normalized_dx)}],
             model=SCORING_MODEL,
             temperature=0.2,
-            max_tokens=900)
+            max_tokens=900,
+            caller="scoring_reason")
         
         # Debug the reasoning output
-        print(f"DEBUG: Reasoning output length: {len(reasoning.splitlines())} lines")
-        print(f"DEBUG: First 3 lines of reasoning: {reasoning.splitlines()[:3]}")
+        log.debug("Reasoning output length: %d lines", len(reasoning.splitlines()))
+        log.debug("First 3 lines of reasoning: %s", reasoning.splitlines()[:3])
         
         # Stage 2: Convert to JSON with EVAL_MODEL (GPT-4o-mini)
         json_block = chat(
             [{"role":"user",
-              "content": JSON_TEMPLATE.format(
-                  schema=json.dumps(_SCHEMA, indent=2),
-                  notes=reasoning
-              )}],
+              "content": JSON_PROMPT.render(notes=reasoning)}],
             model=EVAL_MODEL,
             json_mode=True,
-            temperature=0)
+            temperature=0,
+            caller="scoring_json")
         
         data = json.loads(json_block)
         
         # Debug the data before applying any changes
-        print(f"DEBUG: Received scores: {data.get('scores', [])} (length={len(data.get('scores', []))})")
+        log.debug("Received scores: %s (length=%d)", data.get("scores", []), len(data.get("scores", [])))
         
         # Force diagnosis_score to 0 if diagnosis is empty or "None"
         if is_empty_diagnosis:
@@ -206,30 +399,20 @@ def score(transcript: str, candidate_dx: str = "") -> dict:
             
     except Exception as e:
         # Fallback to one-stage method with EVAL_MODEL
-        print(f"DEBUG: Two-stage scoring failed: {str(e)}. Falling back to one-stage.")
+        log.warning("%s scoring failed: %s. Falling back to one-stage.", mode, e)
         try:
-            system = {"role": "system", "content":
-                "You are an OSCE examiner evaluating a medical student's performance.\n"
-                "Score each checklist item on a scale of 0 (not done), 3 (partially done), or 5 (done well).\n"
-                "Output JSON only, matching the provided schema.\n"
-                "IMPORTANT: Only mark items as 0 (absent) if they are truly not addressed in the conversation.\n"
-                "IMPORTANT: Give credit (score 3 or 5) for ANY attempt to address checklist items, even if brief."}
-
-            user = {"role": "user", "content":
-                f"Conversation:\n{summary}\n\n"
-                f"Student diagnosis: {candidate_dx}\n"
-                f"Checklist items:\n{json.dumps(CHECKLIST_ITEMS)}\n\n"
-                f"Schema:\n{json.dumps(_SCHEMA, indent=1)}"}
+            system = {"role": "system", "content": FALLBACK_SYSTEM}
+            user = {"role": "user", "content": FALLBACK_PROMPT.render(summary=summary, dx=candidate_dx)}
             
             json_block = chat([system, user], model=EVAL_MODEL,
-                       json_mode=True, temperature=0.1)
+                       json_mode=True, temperature=0.1, caller="fallback")
             data = json.loads(json_block)
         except Exception as e2:
-            print(f"DEBUG: All scoring methods failed: {str(e2)}")
+            log.error("All scoring methods failed: %s", e2)
             # Return minimum viable result
             return {
                 "percent": 0,
-                "comments": "The scoring process encountered issues. Please review the transcript manually.",
+                "comments": SCORING_ERROR_COMMENT,
                 "scores": [0] * 35,
                 "item_comments": ["Score not available"] * 35,
                 "candidate_dx": candidate_dx,
@@ -238,8 +421,9 @@ def score(transcript: str, candidate_dx: str = "") -> dict:
             }
     
     result = process_scoring_data(data, candidate_dx)
-    print(f"DEBUG: Final scores summary - zeros: {result['scores'].count(0)}, threes: {result['scores'].count(3)}, fives: {result['scores'].count(5)}")
-    print(f"DEBUG: Final calculated percent: {result['percent']}%")
+    log.debug("Final scores summary - zeros: %d, threes: %d, fives: %d",
+              result["scores"].count(0), result["scores"].count(3), result["scores"].count(5))
+    log.debug("Final calculated percent: %s%%", result["percent"])
     return result
 
 def process_scoring_data(data, candidate_dx):
@@ -258,9 +442,9 @@ def process_scoring_data(data, candidate_dx):
         normalized_dx = candidate_dx.strip() if candidate_dx else ""
         if not normalized_dx or normalized_dx.lower() in ["none", "n/a", "na", "unknown", "not sure", "don't know", "i don't know"]:
             diagnosis_score = 0
-            print("DEBUG: Empty or 'None' diagnosis detected, forcing diagnosis_score to 0")
+            log.debug("Empty or 'None' diagnosis detected, forcing diagnosis_score to 0")
         elif diagnosis_score not in range(6):  # 0-5
-            print(f"DEBUG: Invalid diagnosis score {diagnosis_score}, setting to 0")
+            log.warning("Invalid diagnosis score %s, setting to 0", diagnosis_score)
             diagnosis_score = 0
             
         # Calculate percentage
@@ -277,11 +461,11 @@ def process_scoring_data(data, candidate_dx):
             "scoring_failed": False
         }
     except Exception as e:
-        print(f"DEBUG: Scoring post-processing failed: {str(e)}")
+        log.error("Scoring post-processing failed: %s", e)
         # Fallback in case of parsing failure
         return {
             "percent": 0,
-            "comments": "The scoring process encountered issues. Please review the transcript manually.",
+            "comments": SCORING_ERROR_COMMENT,
             "scores": [0] * expected,
             "item_comments": ["Score not available"] * expected,
             "candidate_dx": candidate_dx,
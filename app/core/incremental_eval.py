@@ -0,0 +1,239 @@
+"""
+Incremental checklist scoring that runs while the station is in progress.
+Each new student/patient exchange is marked in the background against the
+running checklist state, so at the end of the station only the last few
+turns and the diagnosis still need an LLM call.
+Usage:
+    from app.core.incremental_eval import IncrementalScorer
+    scorer = IncrementalScorer()
+    scorer.observe(chat)                 # after every patient reply
+    result = scorer.finalize(chat, dx, case=station)   # same shape as evaluator.score()
+"""
+import hashlib
+import json
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from app.core import EVAL_MODEL
+from app.core.llm import chat
+from app.core.checklist import CHECKLIST_ITEMS
+from app.core.evaluator import (
+    score, process_scoring_data, validate_scores, collapse_transcript, memoized_score, score_cache_key
+)
+from app.core.resilience import time_budget, SCORING_BUDGET
+from app.core import prompts
+
+log = logging.getLogger(__name__)
+
+CONTEXT_MESSAGES = 4        # already-marked messages shown again for context
+
+UPDATE_TEMPLATE = """
+You are an OSCE examiner marking a consultation while it is happening.
+Below is the checklist with each item's current score (0 = not done,
+3 = partially done, 5 = done well) and the newest exchanges.
+
+List ONLY the items whose score should go UP because of the new exchanges.
+Output JSON: {{"updates": [{{"item": <number>, "score": <3 or 5>, "comment": "<=15 words"}}]}}
+If nothing changes, output {{"updates": []}}.
+
+CHECKLIST (number. item [current score]):
+{state}
+
+EARLIER CONVERSATION (context only, already marked):
+{context}
+
+NEW EXCHANGES:
+{exchanges}
+"""
+
+FINAL_TEMPLATE = """
+You are an OSCE examiner finishing the marking of a consultation.
+Below is the checklist with each item's score so far (0 = not done,
+3 = partially done, 5 = done well), the case, the whole conversation,
+the last exchanges that have not been marked yet, and the student's diagnosis.
+
+Output JSON with:
+- updates: [{{"item": <number>, "score": <3 or 5>, "comment": "<=15 words"}}] for items the
+  unmarked exchanges improve (may be empty)
+- comments: overall assessment of the whole consultation (2-3 sentences)
+- diagnosis_score: integer 0-5 for the student's diagnosis against the case's main diagnosis
+  and differentials
+
+CHECKLIST (number. item [current score]):
+{state}
+
+CASE:
+{case}
+
+WHOLE CONVERSATION (bullet summary):
+{summary}
+
+UNMARKED EXCHANGES:
+{exchanges}
+
+STUDENT DIAGNOSIS:
+{dx}
+"""
+
+UPDATE_PROMPT = prompts.register("scoring_incremental", UPDATE_TEMPLATE)
+FINAL_PROMPT = prompts.register("scoring_final", FINAL_TEMPLATE)
+
+_pool = ThreadPoolExecutor(max_workers=8, thread_name_prefix="incremental-eval")
+
+def _format_messages(messages:list) -> str:
+    role_map = {"user": "Student", "assistant": "Patient"}
+    lines = [f"{role_map.get(m.get('role', ''), m.get('role', 'Unknown'))}: {m.get('content', '')}"
+             for m in messages if m.get("content")]
+    return "\n".join(lines) or "(none)"
+
+def case_brief(case) -> str:
+    """Chief complaint and answer key of a station (OsceCase or StreamingCase), for the final pass."""
+    if case is None:
+        return "(not available)"
+    lines = []
+    try:
+        lines.append(f"Chief complaint: {case.chiefComplaint}")
+        key = case.answer_key               # a streaming case settles ``unavailable`` here
+        if "answer_key" not in getattr(case, "unavailable", ()):
+            lines.append(f"Main diagnosis: {key.main_diagnosis}")
+            lines.append(f"Differentials: {', '.join(key.differentials)}")
+    except Exception as e:
+        log.warning("Case details for scoring not available: %s", e)
+    return "\n".join(lines) or "(not available)"
+
+# Part of the score cache key: a prompt change must not return results marked by the old one
+PROMPT_VERSION = hashlib.sha256((UPDATE_TEMPLATE + FINAL_TEMPLATE).encode()).hexdigest()[:12]
+
+class IncrementalScorer:
+    """Running checklist state for one station."""
+
+    def __init__(self):
+        n = len(CHECKLIST_ITEMS)
+        self.scores = [0] * n
+        self.item_comments = ["Not addressed during the consultation"] * n
+        self.marked = 0                 # chat messages already marked
+        self._latest = []
+        self._job = None
+        self._finalized = False         # set by finalize(); a background job still running is ignored
+        self._lock = threading.Lock()   # guards the fields above, scores and marked
+
+    def _state(self) -> str:
+        return "\n".join(f"{i}. {item} [{s}]"
+                         for i, (item, s) in enumerate(zip(CHECKLIST_ITEMS, self.scores), 1))
+
+    def _apply(self, updates:list):
+        """Scores only ever go up: a checklist item done once stays done."""
+        for u in updates or []:
+            try:
+                idx = int(u["item"]) - 1
+                new = validate_scores([int(u["score"])], 1)[0]
+            except (KeyError, TypeError, ValueError):
+                continue
+            if 0 <= idx < len(self.scores) and new > self.scores[idx]:
+                self.scores[idx] = new
+                self.item_comments[idx] = str(u.get("comment", "")) or self.item_comments[idx]
+
+    def _mark(self, messages:list):
+        with self._lock:
+            if self._finalized:
+                return
+            start, state = self.marked, self._state()
+        new = messages[start:]
+        if not new:
+            return
+        raw = chat(
+            [{"role": "user", "content": UPDATE_PROMPT.render(
+                state=state,
+                context=_format_messages(messages[max(0, start - CONTEXT_MESSAGES):start]),
+                exchanges=_format_messages(new)
+            )}],
+            model=EVAL_MODEL,
+            json_mode=True,
+            temperature=0,
+            caller="scoring_incremental"
+        )
+        updates = json.loads(raw).get("updates")
+        with self._lock:
+            if self._finalized or self.marked != start:
+                return                  # finalize() has taken these turns over
+            self._apply(updates)
+            self.marked = len(messages)
+
+    def _run(self):
+        # Keep going until we've caught up with the latest chat we were shown
+        while True:
+            with self._lock:
+                messages = self._latest
+                if self._finalized or len(messages) <= self.marked:
+                    self._job = None
+                    return
+            try:
+                self._mark(messages)
+            except Exception as e:
+                # Leave these turns unmarked; finalize() will cover them
+                log.warning("Incremental scoring update failed: %s", e)
+                with self._lock:
+                    self._job = None
+                return
+
+    def observe(self, messages:list):
+        """Schedule background marking of any exchanges not marked yet."""
+        with self._lock:
+            self._latest = list(messages)
+            if self._job is None:
+                self._job = _pool.submit(self._run)
+
+    def finalize(self, messages:list, candidate_dx:str="", case=None, timeout:float=30) -> dict:
+        """Final delta call for the remaining turns and the diagnosis.
+
+        ``case`` (the station) gives the answer key the diagnosis is marked
+        against.  Returns the same dict as ``evaluator.score``, memoized in
+        the same cache; falls back to full scoring of the transcript if the
+        delta call fails.
+        """
+        brief = case_brief(case)
+        key = score_cache_key(_format_messages(messages), candidate_dx, f"incremental/{PROMPT_VERSION}", brief)
+        return memoized_score(key, candidate_dx, lambda: self._finalize(messages, candidate_dx, brief, timeout))
+
+    @time_budget(SCORING_BUDGET)
+    def _finalize(self, messages:list, candidate_dx:str, brief:str, timeout:float) -> dict:
+        with self._lock:
+            job = self._job
+        if job is not None:
+            try:
+                job.result(timeout=timeout)
+            except Exception:
+                pass                    # whatever is unmarked goes in the delta
+        with self._lock:
+            # From here on a job that outlived the timeout can't touch the state
+            self._finalized = True
+            start, state = self.marked, self._state()
+        try:
+            raw = chat(
+                [{"role": "user", "content": FINAL_PROMPT.render(
+                    state=state,
+                    case=brief,
+                    summary=collapse_transcript(_format_messages(messages)),
+                    exchanges=_format_messages(messages[start:]),
+                    dx=candidate_dx.strip() if candidate_dx else ""
+                )}],
+                model=EVAL_MODEL,
+                json_mode=True,
+                temperature=0,
+                caller="scoring_final"
+            )
+            data = json.loads(raw)
+            with self._lock:
+                self._apply(data.get("updates"))
+                self.marked = len(messages)
+                scores, item_comments = list(self.scores), list(self.item_comments)
+            return process_scoring_data({
+                "scores": scores,
+                "item_comments": item_comments,
+                "comments": data.get("comments", "Evaluation of student performance completed."),
+                "diagnosis_score": data.get("diagnosis_score", 0)
+            }, candidate_dx)
+        except Exception as e:
+            log.warning("Incremental finalize failed: %s. Falling back to full scoring.", e)
+            transcript = _format_messages(messages) if messages else "No conversation recorded."
+            return score(transcript, candidate_dx)
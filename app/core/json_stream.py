@@ -0,0 +1,77 @@
+"""
+Incremental parsing of a JSON object that arrives as a stream of deltas.
+Top-level members are handed out as soon as their value is complete, so a
+caller can act on the first fields of a long completion before the rest
+has been generated.
+Usage:
+    from app.core.json_stream import ObjectStreamParser
+    parser = ObjectStreamParser()
+    for delta in stream_chat(messages, model, json_mode=True):
+        for key, value in parser.feed(delta):
+            print(key, value)
+    data = parser.result()          # the whole object, once the stream closes
+"""
+import json
+
+class ObjectStreamParser:
+    """Splits a streamed top-level JSON object into completed ``(key, value)`` members.
+
+    Only string, bracket and separator state is tracked while scanning;
+    each finished member is decoded with ``json.loads`` on its own.
+    """
+
+    def __init__(self):
+        self._buf = []              # text of the member being scanned
+        self._depth = 0             # 0 = before the opening brace
+        self._in_string = False
+        self._escape = False
+        self.members = {}
+        self.closed = False         # saw the object's closing brace
+
+    def _finish_member(self) -> list:
+        text = "".join(self._buf).strip()
+        self._buf = []
+        if not text:
+            return []
+        member = json.loads("{" + text + "}")
+        self.members.update(member)
+        return list(member.items())
+
+    def feed(self, text:str) -> list:
+        """Consume ``text``; return the members completed by it, in order."""
+        done = []
+        for ch in text:
+            if self.closed:
+                break
+            if self._depth == 0:
+                if ch == "{":
+                    self._depth = 1
+                continue
+            if self._in_string:
+                self._buf.append(ch)
+                if self._escape:
+                    self._escape = False
+                elif ch == "\\":
+                    self._escape = True
+                elif ch == '"':
+                    self._in_string = False
+                continue
+            if self._depth == 1 and ch in ",}":
+                done += self._finish_member()
+                if ch == "}":
+                    self._depth, self.closed = 0, True
+                continue
+            self._buf.append(ch)
+            if ch == '"':
+                self._in_string = True
+            elif ch in "{[":
+                self._depth += 1
+            elif ch in "}]":
+                self._depth -= 1
+        return done
+
+    def result(self) -> dict:
+        """Every member parsed; raises ``ValueError`` if the object never closed."""
+        if not self.closed:
+            raise ValueError("JSON object is incomplete")
+        return dict(self.members)
@@ -1,29 +1,344 @@
 """
 Light wrapper around the OpenAI chat API with automatic retries.
+Every request runs on one private event loop that owns a pooled async HTTP
+client, so many calls can be in flight from a single server process.
 Usage:
-    from app.core.llm import chat
+    from app.core.llm import chat, achat
     txt = chat([{"role":"user","content":"Hello"}], model="gpt-4o")
+    txts = await asyncio.gather(*(achat(m, model="gpt-4o") for m in batch))
+    for delta in stream_chat(messages, model="gpt-4o"):
+        print(delta, end="")
+Deterministic calls (temperature 0, or ``cache=True``) are served from a
+response cache, and identical ones already in flight share one request.  ``caller=`` labels the call for cache statistics and for
+the per-call records sent to ``app.core.telemetry``.
 """
-import os, backoff
-from openai import OpenAI
+import os, asyncio, contextvars, logging, queue, threading, time, httpx
+from collections import defaultdict
+from openai import AsyncOpenAI
 from dotenv import load_dotenv
 from app.core import FALLBACK_MODEL
+from app.core.cache import CACHE_DIR, LRUCache, SQLiteCache, TieredCache, make_key
+from app.core import telemetry
+from app.core.resilience import BudgetExceeded, call_with_policy, check_json, classify, current_deadline
+from app.core.scheduler import get_scheduler, priority_for, estimate_request_tokens, FOREGROUND
 
 load_dotenv()
-_client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+log = logging.getLogger(__name__)
 
-@backoff.on_exception(backoff.expo, Exception, max_tries=5, max_time=60)
-def chat(messages, model, *, json_mode=False, **kw):
-    try:
-        resp = _client.chat.completions.create(
-            model=model,
-            messages=messages,
-            response_format={"type":"json_object"} if json_mode else None,
-            **kw
+# "openai" (default), or "offline" / "replay" / "record" – see app/core/llm_offline.py
+BACKEND = os.getenv("OSCE_LLM_BACKEND", "openai")
+
+# HTTP connection pool shared by every request from this process
+MAX_CONNECTIONS  = int(os.getenv("OSCE_LLM_MAX_CONNECTIONS", "50"))
+MAX_KEEPALIVE    = int(os.getenv("OSCE_LLM_MAX_KEEPALIVE", "20"))
+KEEPALIVE_EXPIRY = float(os.getenv("OSCE_LLM_KEEPALIVE_EXPIRY", "30"))   # seconds
+REQUEST_TIMEOUT  = float(os.getenv("OSCE_LLM_TIMEOUT", "60"))            # seconds
+
+# Response cache for deterministic calls: "memory", "disk" or "off"
+CACHE_BACKEND = os.getenv("OSCE_LLM_CACHE", "memory")
+CACHE_SIZE    = int(os.getenv("OSCE_LLM_CACHE_SIZE", "512"))      # entries kept in memory
+
+def _make_cache():
+    if CACHE_BACKEND == "off":
+        return None
+    disk = None
+    if CACHE_BACKEND == "disk":
+        disk = SQLiteCache(os.path.join(CACHE_DIR, "llm_cache.sqlite3"), max_entries=CACHE_SIZE * 20)
+    return TieredCache(LRUCache(max_entries=CACHE_SIZE), disk)
+
+_cache = _make_cache()
+_cache_stats = defaultdict(lambda: {"hits": 0, "misses": 0, "coalesced": 0})
+_stats_lock = threading.Lock()
+
+_loop = None
+_client = None
+_loop_lock = threading.Lock()
+
+def _get_loop() -> asyncio.AbstractEventLoop:
+    """Background event loop that owns the client, started on first use."""
+    global _loop
+    with _loop_lock:
+        if _loop is None:
+            loop = asyncio.new_event_loop()
+            threading.Thread(target=loop.run_forever, name="llm-loop", daemon=True).start()
+            _loop = loop
+        return _loop
+
+def _make_openai_client() -> AsyncOpenAI:
+    return AsyncOpenAI(
+        api_key=os.getenv("OPENAI_API_KEY"),
+        max_retries=0,                      # retries are app.core.resilience's job
+        http_client=httpx.AsyncClient(
+            limits=httpx.Limits(
+                max_connections=MAX_CONNECTIONS,
+                max_keepalive_connections=MAX_KEEPALIVE,
+                keepalive_expiry=KEEPALIVE_EXPIRY
+            ),
+            timeout=REQUEST_TIMEOUT
         )
-        return resp.choices[0].message.content
+    )
+
+def _get_client():
+    # Only ever called on _loop, so no locking needed
+    global _client
+    if _client is None:
+        if BACKEND == "openai":
+            _client = _make_openai_client()
+        else:
+            from app.core.llm_offline import make_client
+            _client = make_client(BACKEND, _make_openai_client)
+    return _client
+
+# Telemetry record of the call running in the current task
+_record = contextvars.ContextVar("llm_record", default=None)
+
+def _record_usage(rec, model, usage):
+    rec["model_used"] = model
+    if usage is not None:
+        rec["prompt_tokens"] = getattr(usage, "prompt_tokens", 0) or 0
+        rec["completion_tokens"] = getattr(usage, "completion_tokens", 0) or 0
+
+async def _attempt(messages, model, *, json_mode=False, **kw):
+    """One request to one model; JSON-mode replies that don't parse count as failures."""
+    resp = await _get_client().chat.completions.create(
+        model=model,
+        messages=messages,
+        response_format={"type":"json_object"} if json_mode else None,
+        **kw
+    )
+    content = resp.choices[0].message.content
+    usage = getattr(resp, "usage", None)
+    rec = _record.get()
+    if usage is not None:
+        get_scheduler().settle(model, estimate_request_tokens(messages, kw), usage.total_tokens,
+                               priority_for(rec["caller"]) if rec is not None else FOREGROUND)
+    if json_mode:
+        check_json(content)
+    if rec is not None:
+        _record_usage(rec, model, usage)
+    return content
+
+def _admission(messages, kw, rec):
+    """``admit`` hook for call_with_policy: wait for a rate-limit slot on the model."""
+    tokens = estimate_request_tokens(messages, kw)
+    priority = priority_for(rec["caller"])
+
+    async def admit(model):
+        rec["queue_wait_s"] = round(rec["queue_wait_s"] + await get_scheduler().acquire(model, tokens, priority), 4)
+    return admit
+
+async def _instrumented(messages, model, json_mode, caller, kw, deadline):
+    """Run one logical call (retries and fallback included) and emit its record."""
+    rec = telemetry.new_record(caller, model)
+    _record.set(rec)
+    start = time.perf_counter()
+    try:
+        return await call_with_policy(
+            lambda m: _attempt(messages, m, json_mode=json_mode, **kw),
+            model, FALLBACK_MODEL, deadline, rec, admit=_admission(messages, kw, rec))
     except Exception as e:
-        if model != FALLBACK_MODEL:          # one-step fallback
-            return chat(messages, model=FALLBACK_MODEL,
-                        json_mode=json_mode, **kw)
-        raise 
\ No newline at end of file
+        rec["ok"], rec["error"] = False, classify(e)
+        raise
+    finally:
+        rec["latency_s"] = round(time.perf_counter() - start, 4)
+        telemetry.emit(rec)
+
+def cache_key(messages, model, json_mode, kw) -> str:
+    """Canonical key for a request: messages + model + sampling params."""
+    return make_key({"messages": messages, "model": model, "json_mode": json_mode,
+                     "params": {k: v for k, v in kw.items() if k != "stream"}})
+
+def _lookup(messages, model, json_mode, cache, caller, kw):
+    """Return (key, hit, value); key is None when the call isn't cacheable.
+
+    Cacheable calls get a key even with the cache off, for coalescing.
+    """
+    if cache is None:
+        cache = kw.get("temperature") == 0       # only deterministic calls by default
+    if not cache or kw.get("stream"):
+        return None, False, None
+    key = cache_key(messages, model, json_mode, kw)
+    if _cache is None:
+        return key, False, None
+    hit, value = _cache.get(key)
+    with _stats_lock:
+        _cache_stats[caller]["hits" if hit else "misses"] += 1
+    if hit:
+        rec = telemetry.new_record(caller, model)
+        rec["cached"] = True
+        telemetry.emit(rec)
+    return key, hit, value
+
+# Cacheable requests currently in flight, by cache key; only touched on _loop
+_inflight = {}
+
+async def _fetch(messages, model, json_mode, caller, kw, deadline, key):
+    result = await _instrumented(messages, model, json_mode, caller, kw, deadline)
+    if _cache is not None:
+        _cache.set(key, result)
+    return result
+
+async def _single_flight(messages, model, json_mode, caller, kw, deadline, key):
+    """Run on _loop: identical cacheable calls in flight share one request.
+
+    Every waiter gets the same result or the same exception, each within
+    its own time budget.
+    """
+    if key is None:
+        return await _instrumented(messages, model, json_mode, caller, kw, deadline)
+    task = _inflight.get(key)
+    if task is None:
+        task = asyncio.ensure_future(_fetch(messages, model, json_mode, caller, kw, deadline, key))
+        _inflight[key] = task
+        task.add_done_callback(lambda t: _inflight.pop(key, None) if _inflight.get(key) is t else None)
+        return await asyncio.shield(task)    # a cancelled waiter mustn't cancel the others
+
+    with _stats_lock:
+        _cache_stats[caller]["coalesced"] += 1
+    rec = telemetry.new_record(caller, model)
+    rec["coalesced"] = True
+    start = time.perf_counter()
+    try:
+        return await asyncio.wait_for(asyncio.shield(task), timeout=max(0.0, deadline - time.monotonic()))
+    except asyncio.TimeoutError:
+        rec["ok"], rec["error"] = False, "timeout"
+        if task.done():
+            raise
+        raise BudgetExceeded("action budget ran out waiting for an identical request") from None
+    except Exception as e:
+        rec["ok"], rec["error"] = False, classify(e)
+        raise
+    finally:
+        rec["latency_s"] = round(time.perf_counter() - start, 4)
+        telemetry.emit(rec)
+
+def cache_stats() -> dict:
+    """Hit/miss/coalesced counts per caller, plus totals for the cache backend."""
+    with _stats_lock:
+        out = {caller: dict(c) for caller, c in _cache_stats.items()}
+    if _cache is not None:
+        out["_backend"] = _cache.stats()
+    return out
+
+async def achat(messages, model, *, json_mode=False, cache=None, caller="default", **kw):
+    """Coroutine version of ``chat``; safe to ``asyncio.gather`` from any loop.
+
+    The request itself always runs on the private loop so every caller shares
+    the same connection pool.
+    """
+    key, hit, value = _lookup(messages, model, json_mode, cache, caller, kw)
+    if hit:
+        return value
+    loop = _get_loop()
+    coro = _single_flight(messages, model, json_mode, caller, kw, current_deadline(), key)
+    try:
+        running = asyncio.get_running_loop()
+    except RuntimeError:
+        running = None
+    if running is loop:
+        return await coro
+    return await asyncio.wrap_future(asyncio.run_coroutine_threadsafe(coro, loop))
+
+def chat(messages, model, *, json_mode=False, cache=None, caller="default", **kw):
+    """Blocking shim over ``achat`` for synchronous callers.
+
+    ``cache`` forces caching on or off; by default only temperature-0 calls
+    are cached.  ``caller`` labels the call in ``cache_stats()`` and telemetry.
+    """
+    key, hit, value = _lookup(messages, model, json_mode, cache, caller, kw)
+    if hit:
+        return value
+    future = asyncio.run_coroutine_threadsafe(
+        _single_flight(messages, model, json_mode, caller, kw, current_deadline(), key), _get_loop())
+    return future.result()
+
+async def _open_stream(messages, model, *, json_mode=False, **kw):
+    return await _get_client().chat.completions.create(
+        model=model,
+        messages=messages,
+        response_format={"type":"json_object"} if json_mode else None,
+        stream=True,
+        stream_options={"include_usage": True},
+        **kw
+    )
+
+async def _astream(messages, model, deadline, *, json_mode=False, **kw):
+    """Yield content deltas as they arrive.
+
+    Retries and the fallback model only apply to opening the stream; once
+    text has been yielded an error is raised to the caller.
+    """
+    rec = _record.get()
+    opened = {}
+
+    async def attempt(m):
+        stream = await _open_stream(messages, m, json_mode=json_mode, **kw)
+        opened["model"] = m
+        return stream
+
+    stream = await call_with_policy(attempt, model, FALLBACK_MODEL, deadline, rec,
+                                    admit=_admission(messages, kw, rec))
+    model = opened["model"]
+    try:
+        async for chunk in stream:
+            if getattr(chunk, "usage", None) is not None:
+                get_scheduler().settle(model, estimate_request_tokens(messages, kw), chunk.usage.total_tokens,
+                                       priority_for(rec["caller"]) if rec is not None else FOREGROUND)
+                if rec is not None:
+                    _record_usage(rec, model, chunk.usage)
+            if chunk.choices and chunk.choices[0].delta.content:
+                yield chunk.choices[0].delta.content
+    finally:
+        await stream.close()                 # stops generation server-side too
+
+_DONE = object()
+
+def stream_chat(messages, model, *, json_mode=False, caller="default", **kw):
+    """Blocking generator of content deltas.
+
+    Closing the generator early (``break`` or ``.close()``) cancels the
+    request, so the provider stops generating tokens nobody will read.
+    The action's time budget is taken when the generator is created.
+    """
+    return _stream_deltas(messages, model, json_mode, caller, kw, current_deadline())
+
+def _stream_deltas(messages, model, json_mode, caller, kw, deadline):
+    deltas = queue.Queue()
+
+    async def pump():
+        rec = telemetry.new_record(caller, model, stream=True)
+        _record.set(rec)
+        start = time.perf_counter()
+        n_deltas = 0
+        try:
+            async for delta in _astream(messages, model, deadline, json_mode=json_mode, **kw):
+                if rec["first_token_s"] is None:
+                    rec["first_token_s"] = round(time.perf_counter() - start, 4)
+                n_deltas += 1
+                deltas.put(delta)
+        except asyncio.CancelledError:
+            rec["error"] = "cancelled"           # reader stopped early; not a failure
+            raise
+        except Exception as e:
+            rec["ok"], rec["error"] = False, classify(e)
+            deltas.put(e)
+        finally:
+            if not rec["completion_tokens"]:
+                # Closed before the usage chunk arrived: roughly one token per delta
+                rec["completion_tokens"] = n_deltas
+                rec["prompt_tokens"] = sum(len(m.get("content") or "") for m in messages) // 4
+            rec["latency_s"] = round(time.perf_counter() - start, 4)
+            telemetry.emit(rec)
+            deltas.put(_DONE)
+
+    future = asyncio.run_coroutine_threadsafe(pump(), _get_loop())
+    try:
+        while True:
+            item = deltas.get()
+            if item is _DONE:
+                return
+            if isinstance(item, Exception):
+                raise item
+            yield item
+    finally:
+        future.cancel()
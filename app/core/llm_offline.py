@@ -0,0 +1,415 @@
+"""
+Offline stand-in for the OpenAI chat API, for load tests and benchmarks.
+Select it with OSCE_LLM_BACKEND:
+    offline  – synthetic completions for every prompt this app sends
+    replay   – completions recorded in OSCE_LLM_RECORD_FILE, synthetic on a miss
+    record   – real API calls, appended to OSCE_LLM_RECORD_FILE as they happen
+The stand-in plugs in where the AsyncOpenAI client would, so retries, the
+fallback model, caching and streaming all run exactly as in production.
+Latency, error injection and time scaling are configured from the
+environment (see ``OfflineConfig``).
+"""
+import asyncio
+import json
+import os
+import random
+import re
+import threading
+from types import SimpleNamespace
+
+import httpx
+import openai
+
+from app.core.cache import make_key
+from app.core.checklist import CHECKLIST_ITEMS
+
+def _env_float(name:str, default:float) -> float:
+    return float(os.getenv(name, str(default)))
+
+class OfflineConfig:
+    """Knobs for the stand-in, read from the environment.
+
+    OSCE_OFFLINE_LATENCY        fixed:S | uniform:A,B | lognormal:MEDIAN,SIGMA  (time to first token)
+    OSCE_OFFLINE_TOKEN_LATENCY  seconds per generated token (default 0.01)
+    OSCE_OFFLINE_TIME_SCALE     multiply every sleep by this (0 = no sleeping)
+    OSCE_OFFLINE_ERROR_RATE     chance that a request fails (default 0)
+    OSCE_OFFLINE_ERRORS         comma list of rate_limit, timeout, server, bad_request, json
+    OSCE_OFFLINE_FAIL_MODELS    only inject errors for these models (comma list)
+    OSCE_OFFLINE_SEED           seed for latency and error sampling
+    """
+    def __init__(self):
+        self.latency = os.getenv("OSCE_OFFLINE_LATENCY", "lognormal:0.6,0.35")
+        self.token_latency = _env_float("OSCE_OFFLINE_TOKEN_LATENCY", 0.01)
+        self.time_scale = _env_float("OSCE_OFFLINE_TIME_SCALE", 1.0)
+        self.error_rate = _env_float("OSCE_OFFLINE_ERROR_RATE", 0.0)
+        self.errors = [e.strip() for e in os.getenv("OSCE_OFFLINE_ERRORS", "rate_limit,timeout,server").split(",") if e.strip()]
+        self.fail_models = {m.strip() for m in os.getenv("OSCE_OFFLINE_FAIL_MODELS", "").split(",") if m.strip()}
+        self.rng = random.Random(int(os.getenv("OSCE_OFFLINE_SEED", "1234")))
+        self._lock = threading.Lock()
+
+    def first_token_delay(self) -> float:
+        kind, _, args = self.latency.partition(":")
+        nums = [float(x) for x in args.split(",") if x]
+        with self._lock:
+            if kind == "fixed":
+                delay = nums[0]
+            elif kind == "uniform":
+                delay = self.rng.uniform(nums[0], nums[1])
+            else:                               # lognormal around a median
+                delay = nums[0] * self.rng.lognormvariate(0, nums[1] if len(nums) > 1 else 0.35)
+        return delay * self.time_scale
+
+    def token_delay(self) -> float:
+        return self.token_latency * self.time_scale
+
+    def pick_error(self, model:str) -> str | None:
+        if self.fail_models and model not in self.fail_models:
+            return None
+        with self._lock:
+            if self.error_rate <= 0 or self.rng.random() >= self.error_rate:
+                return None
+            return self.rng.choice(self.errors)
+
+def _estimate_tokens(text:str) -> int:
+    return max(1, round(len(text.encode("utf-8")) / 4)) if text else 0
+
+def _raise_error(kind:str):
+    req = httpx.Request("POST", "https://offline.invalid/v1/chat/completions")
+    if kind == "timeout":
+        raise openai.APITimeoutError(request=req)
+    status, cls = {
+        "rate_limit": (429, openai.RateLimitError),
+        "server": (500, openai.InternalServerError),
+        "bad_request": (400, openai.BadRequestError),
+    }[kind]
+    raise cls(f"offline stand-in injected {kind}", response=httpx.Response(status, request=req), body=None)
+
+# ---------------------------------------------------------------------------
+# Synthetic content.  Everything is derived from the request itself, so the
+# same request always gets the same answer (caches and replay depend on it).
+# ---------------------------------------------------------------------------
+
+_CASES = {
+    "chest pain": dict(
+        dx="Stable angina", differentials=["Acute coronary syndrome", "GERD", "Musculoskeletal chest pain"],
+        labs={"Troponin I": "<0.01 ng/mL (normal)", "Total cholesterol": "6.4 mmol/L (high)", "HbA1c": "5.9%"},
+        imaging={"ECG": "Sinus rhythm, no acute ST changes", "Chest X-ray": "Normal heart size, clear lungs"},
+        exam=["BP 148/92 mmHg", "HR 84 regular", "Chest clear", "No peripheral oedema"]),
+    "headache": dict(
+        dx="Migraine without aura", differentials=["Tension-type headache", "Medication overuse headache"],
+        labs={"CBC": "Normal", "ESR": "8 mm/h"},
+        imaging={"CT head": "Not indicated"},
+        exam=["Neurological examination normal", "Fundoscopy normal", "BP 124/78 mmHg"]),
+    "abdominal pain": dict(
+        dx="Acute cholecystitis", differentials=["Biliary colic", "Peptic ulcer disease", "Pancreatitis"],
+        labs={"WBC": "14.2 x10^9/L (high)", "ALP": "160 U/L", "Lipase": "Normal"},
+        imaging={"Abdominal ultrasound": "Thickened gallbladder wall with gallstones"},
+        exam=["Temp 38.1 C", "Right upper quadrant tenderness", "Positive Murphy's sign"]),
+    "cough": dict(
+        dx="Community-acquired pneumonia", differentials=["Acute bronchitis", "Pulmonary embolism"],
+        labs={"WBC": "13.1 x10^9/L", "CRP": "85 mg/L"},
+        imaging={"Chest X-ray": "Right lower lobe consolidation"},
+        exam=["Temp 38.4 C", "RR 22", "Crackles right base", "SpO2 94% on air"]),
+}
+
+# Keywords that make the examiner stand-in credit a checklist item (1-based)
+_ITEM_KEYWORDS = {
+    1: ["hello", "my name", "i'm the doctor", "i am dr"], 2: ["when did", "where", "how long"],
+    3: ["any other", "associated", "nausea", "shortness"], 4: ["faint", "severe", "worst"],
+    5: ["fever", "weight loss", "night sweats"], 8: ["medical history", "conditions"],
+    9: ["surgery", "operation"], 10: ["medication", "allerg"], 11: ["family"],
+    12: ["smoke", "alcohol", "work"], 15: ["worried", "concern", "expect", "affecting"],
+    18: ["wash my hands", "permission", "may i examine"], 19: ["blood pressure", "pulse", "vital"],
+    21: ["examine"], 25: ["blood test", "bloods", "lab"], 26: ["x-ray", "scan", "ultrasound"],
+    27: ["diagnosis", "treatment", "options"], 28: ["don't worry", "understand"], 30: ["prescribe", "tablet"],
+    32: ["further test", "order"], 33: ["follow-up", "come back"], 35: ["thank you", "any questions"],
+}
+
+def _field(prompt:str, name:str, default:str="") -> str:
+    m = re.search(rf"^{re.escape(name)}:\s*(.+)$", prompt, re.M)
+    return m.group(1).strip() if m else default
+
+def _case_json(prompt:str, rng:random.Random) -> str:
+    name = _field(prompt, "Name", "Alex Morgan")
+    age = int(re.sub(r"\D", "", _field(prompt, "Age", "45")) or 45)
+    gender = _field(prompt, "Gender", "Male")
+    occupation = _field(prompt, "Occupation", "Teacher")
+    lang = _field(prompt, "Language", "en")
+    chief = _field(prompt, "Chief complaint", "")
+    key = next((k for k in _CASES if k in chief.lower()), None) or rng.choice(sorted(_CASES))
+    if not chief or chief.lower().startswith("generate"):
+        chief = key.capitalize()
+    c = _CASES[key]
+    first = name.split()[0]
+    return json.dumps({                 # in the order the case prompt asks for
+        "chiefComplaint": chief,
+        "candidate_instructions": f"Time allowed: 8 minutes. Take a focused history from {name}, "
+                                  f"examine as appropriate and discuss a management plan. Good luck.",
+        "patientInfo": {"name": name, "age": age, "gender": gender, "occupation": occupation},
+        "personality": {"trait": rng.choice(["chatty", "terse", "anxious", "reserved"]),
+                        "coping_style": rng.choice(["stoical", "denial", "humor"])},
+        "backstory": f"{first} lives with family and has been under pressure at work for months.",
+        "historyDetails": {"onset": "3 days ago", "character": "constant", "severity": "6/10",
+                           "aggravating": "exertion", "relieving": "rest"},
+        "pastMedicalHistory": ["Hypertension"],
+        "medications": ["Amlodipine 5 mg daily"],
+        "familyHistory": ["Father had a heart attack at 60"],
+        "socialHistory": {"smoking": "10 cigarettes/day", "alcohol": "Occasional", "living": "With family"},
+        "physicalFindings": c["exam"],
+        "keyHistoryQuestions": ["Onset and character of symptoms", "Red flag symptoms"],
+        "keyExamManeuvers": ["Vital signs", "Focused system examination"],
+        "narrative": f"{name} is a {age}-year-old {occupation.lower()} who has come in with {chief.lower()}. "
+                     f"{first} is worried it might be something serious and wants answers today.",
+        **({} if "written separately" in prompt else _sections(c)),
+        "lang": lang,
+    })
+
+def _sections(c:dict) -> dict:
+    return {
+        "answer_key": {"main_diagnosis": c["dx"], "differentials": c["differentials"],
+                       "management": ["Explain diagnosis", "Start appropriate treatment", "Arrange follow-up"]},
+        "reviewOfSystems": {"constitutional": "No weight loss", "respiratory": "No cough"},
+        "labResults": c["labs"],
+        "imagingResults": c["imaging"],
+        "marking_sheet": list(CHECKLIST_ITEMS),
+    }
+
+def _case_sections(prompt:str, rng:random.Random) -> str:
+    try:
+        chief = json.loads(_between(prompt, "CASE:").strip()).get("chiefComplaint", "")
+    except ValueError:
+        chief = ""
+    key = next((k for k in _CASES if k in chief.lower()), None) or rng.choice(sorted(_CASES))
+    return json.dumps(_sections(_CASES[key]))
+
+_PATIENT_EN = [
+    "Well, doctor, it started a few days ago and it just won't go away.",
+    "It's worse when I climb the stairs, and rest seems to help a bit.",
+    "I'm honestly quite worried because my father had heart trouble.",
+    "I haven't been sleeping well since this began.",
+    "My family keeps telling me I should have come in sooner.",
+]
+_PATIENT_AR = [
+    "يا دكتور، بدأ الأمر قبل أيام قليلة ولم يختفِ.",
+    "يزداد سوءاً عندما أصعد الدرج، والراحة تساعد قليلاً.",
+    "أنا قلق جداً لأن والدي كان يعاني من مشاكل في القلب.",
+    "لم أنم جيداً منذ أن بدأ هذا.",
+]
+
+def _judge(conversation:str) -> list:
+    """0/3/5 per checklist item from keywords in the student's lines."""
+    student = " ".join(line for line in conversation.lower().splitlines()
+                       if line.strip().startswith(("student", "doctor", "- student", "user")))
+    scores = []
+    for i in range(1, len(CHECKLIST_ITEMS) + 1):
+        hits = sum(k in student for k in _ITEM_KEYWORDS.get(i, []))
+        scores.append(5 if hits >= 2 else 3 if hits == 1 else 0)
+    return scores
+
+def _between(text:str, start:str, end:str|None=None) -> str:
+    part = text.split(start, 1)[-1]
+    return part.split(end, 1)[0] if end and end in part else part
+
+def synthesize(messages:list, json_mode:bool, rng:random.Random) -> str:
+    """Plausible completion for any prompt this app sends."""
+    system = messages[0]["content"] if messages and messages[0]["role"] == "system" else ""
+    prompt = messages[-1]["content"] if messages else ""
+    everything = "\n".join(m["content"] for m in messages)
+
+    if "failed validation" in everything:
+        names = [n.strip() for n in _field(everything, "FIELDS").split(",")]
+        full = json.loads(_case_json(everything, rng))
+        return json.dumps({n: full[n] for n in names if n in full})
+    if "OSCE case writer" in everything:
+        return _case_json(everything, rng)
+    if "completing an OSCE case" in everything:
+        return _case_sections(everything, rng)
+    if system.startswith("You're a patient named"):
+        pool = _PATIENT_AR if "RESPOND IN ARABIC" in system else _PATIENT_EN
+        return " ".join(rng.sample(pool, min(len(pool), rng.randint(3, 5))))
+    if "running summary" in prompt:
+        return "The doctor has taken an initial history; the patient described the main complaint and is worried."
+    if "Convert the examiner notes" in prompt:
+        notes = _between(prompt, "NOTES")
+        scores = [int(m.group(1)) for m in re.finditer(r"^\s*(\d)\s+", notes, re.M)]
+        return json.dumps({"scores": scores, "item_comments": ["See examiner notes"] * len(scores),
+                           "comments": "Reasonable consultation with some gaps.", "diagnosis_score": 3})
+    if "<item number>|<score>|" in prompt:
+        scores = _judge(_between(prompt, "Conversation (bullet summary):", "Student's stated diagnosis"))
+        lines = [f"{i}|{s}|{'Done' if s else 'Not addressed in the conversation'}" for i, s in enumerate(scores, 1)]
+        return "\n".join(lines + ["DX|3", "COMMENTS|Reasonable consultation with some gaps."])
+    if "WRITE 35 LINES" in prompt:
+        scores = _judge(_between(prompt, "Conversation (bullet summary):", "Student's stated diagnosis"))
+        return "\n".join(f"{s}  {item[:40]}" for s, item in zip(scores, CHECKLIST_ITEMS))
+    if '"updates"' in prompt or "- updates:" in prompt:
+        scores = _judge(_between(prompt, "NEW EXCHANGES:") if "NEW EXCHANGES:" in prompt
+                        else _between(prompt, "UNMARKED EXCHANGES:", "STUDENT DIAGNOSIS:"))
+        out = {"updates": [{"item": i, "score": s, "comment": "Observed in conversation"}
+                           for i, s in enumerate(scores, 1) if s]}
+        if "diagnosis_score" in prompt:
+            out.update(comments="Reasonable consultation with some gaps.", diagnosis_score=3)
+        return json.dumps(out)
+    if json_mode and "scores" in everything:
+        scores = _judge(everything)
+        return json.dumps({"scores": scores, "item_comments": ["Assessed from transcript"] * len(scores),
+                           "comments": "Brief consultation.", "diagnosis_score": 2})
+    return "{}" if json_mode else "OK."
+
+def _apply_limits(text:str, kw:dict) -> str:
+    """Honour stop sequences and max_tokens the way the real API would."""
+    for stop in kw.get("stop") or []:
+        if stop in text:
+            text = text.split(stop, 1)[0]
+    max_tokens = kw.get("max_tokens")
+    if max_tokens and _estimate_tokens(text) > max_tokens:
+        text = text.encode("utf-8")[:max_tokens * 4].decode("utf-8", "ignore")
+    return text
+
+def _pieces(text:str) -> list:
+    """Split into token-sized streaming deltas (words plus trailing space)."""
+    return re.findall(r"\S+\s*|\s+", text)
+
+def _completion(model:str, content:str, prompt_tokens:int):
+    usage = SimpleNamespace(prompt_tokens=prompt_tokens, completion_tokens=_estimate_tokens(content),
+                            total_tokens=prompt_tokens + _estimate_tokens(content))
+    message = SimpleNamespace(role="assistant", content=content)
+    return SimpleNamespace(model=model, usage=usage,
+                           choices=[SimpleNamespace(index=0, message=message, finish_reason="stop")])
+
+class OfflineStream:
+    """Async iterator of chunks with the same shape as ``openai.AsyncStream``."""
+
+    def __init__(self, model:str, text:str, config:OfflineConfig, prompt_tokens:int,
+                 include_usage:bool=False):
+        self.model = model
+        self.text = text
+        self.config = config
+        self.prompt_tokens = prompt_tokens
+        self.include_usage = include_usage
+        self.closed = False
+
+    def __aiter__(self):
+        return self._chunks()
+
+    async def _chunks(self):
+        await asyncio.sleep(self.config.first_token_delay())
+        for piece in _pieces(self.text):
+            if self.closed:
+                return
+            delta = SimpleNamespace(role="assistant", content=piece)
+            yield SimpleNamespace(model=self.model, usage=None,
+                                  choices=[SimpleNamespace(index=0, delta=delta, finish_reason=None)])
+            await asyncio.sleep(self.config.token_delay())
+        if self.include_usage:          # final usage-only chunk, as with stream_options
+            yield SimpleNamespace(model=self.model, choices=[],
+                                  usage=_completion(self.model, self.text, self.prompt_tokens).usage)
+
+    async def close(self):
+        self.closed = True
+
+class _Completions:
+    def __init__(self, owner):
+        self._owner = owner
+
+    async def create(self, *, model, messages, response_format=None, stream=False, **kw):
+        return await self._owner.complete(model, messages, response_format, stream, kw)
+
+class OfflineClient:
+    """Drop-in for ``AsyncOpenAI`` that never touches the network."""
+
+    def __init__(self, config:OfflineConfig|None=None, recordings:dict|None=None):
+        self.config = config or OfflineConfig()
+        self.recordings = recordings or {}
+        self.chat = SimpleNamespace(completions=_Completions(self))
+        self.requests = 0
+
+    async def complete(self, model, messages, response_format, stream, kw):
+        self.requests += 1
+        json_mode = bool(response_format) and response_format.get("type") == "json_object"
+        error = self.config.pick_error(model)
+        if error and error != "json":
+            await asyncio.sleep(self.config.first_token_delay())
+            _raise_error(error)
+
+        key = recording_key(messages, model, json_mode)
+        if key in self.recordings:
+            text = self.recordings[key]
+        else:
+            text = synthesize(messages, json_mode, random.Random(key))
+        if error == "json":
+            text = text[: len(text) // 2]               # truncated, unparseable JSON
+        text = _apply_limits(text, kw)
+        prompt_tokens = sum(_estimate_tokens(m.get("content") or "") for m in messages)
+
+        if stream:
+            include_usage = bool((kw.get("stream_options") or {}).get("include_usage"))
+            return OfflineStream(model, text, self.config, prompt_tokens, include_usage)
+        await asyncio.sleep(self.config.first_token_delay()
+                            + self.config.token_delay() * _estimate_tokens(text))
+        return _completion(model, text, prompt_tokens)
+
+def recording_key(messages:list, model:str, json_mode:bool) -> str:
+    return make_key({"messages": messages, "model": model, "json_mode": json_mode})
+
+def load_recordings(path:str) -> dict:
+    recordings = {}
+    if path and os.path.exists(path):
+        with open(path, encoding="utf-8") as f:
+            for line in f:
+                if line.strip():
+                    rec = json.loads(line)
+                    recordings[rec["key"]] = rec["content"]
+    return recordings
+
+class _RecordingStream:
+    def __init__(self, stream, on_done):
+        self._stream = stream
+        self._on_done = on_done
+        self._parts = []
+
+    def __aiter__(self):
+        return self._chunks()
+
+    async def _chunks(self):
+        async for chunk in self._stream:
+            if chunk.choices and chunk.choices[0].delta.content:
+                self._parts.append(chunk.choices[0].delta.content)
+            yield chunk
+        self._on_done("".join(self._parts))
+
+    async def close(self):
+        await self._stream.close()
+
+class RecordingClient:
+    """Wraps the real client and appends every completion to a JSONL file."""
+
+    def __init__(self, real, path:str):
+        self._real = real
+        self._path = path
+        self._lock = threading.Lock()
+        self.chat = SimpleNamespace(completions=_Completions(self))
+
+    def _save(self, key:str, model:str, content:str):
+        with self._lock, open(self._path, "a", encoding="utf-8") as f:
+            f.write(json.dumps({"key": key, "model": model, "content": content}, ensure_ascii=False) + "\n")
+
+    async def complete(self, model, messages, response_format, stream, kw):
+        json_mode = bool(response_format) and response_format.get("type") == "json_object"
+        key = recording_key(messages, model, json_mode)
+        resp = await self._real.chat.completions.create(
+            model=model, messages=messages, response_format=response_format, stream=stream, **kw)
+        if stream:
+            return _RecordingStream(resp, lambda text: self._save(key, model, text))
+        self._save(key, model, resp.choices[0].message.content)
+        return resp
+
+def make_client(backend:str, real_factory):
+    """Client for OSCE_LLM_BACKEND; ``real_factory`` builds the real AsyncOpenAI."""
+    path = os.getenv("OSCE_LLM_RECORD_FILE", "llm_recordings.jsonl")
+    if backend == "offline":
+        return OfflineClient()
+    if backend == "replay":
+        return OfflineClient(recordings=load_recordings(path))
+    if backend == "record":
+        return RecordingClient(real_factory(), path)
+    raise ValueError(f"unknown OSCE_LLM_BACKEND {backend!r}")
@@ -1,23 +1,50 @@
 from textwrap import dedent
+import hashlib
 import json
+import logging
 import random
+import re
+import unicodedata
+from collections.abc import Mapping
+from concurrent.futures import ThreadPoolExecutor
 from typing import List, Dict
-from app.core.llm import chat
+from app.core.llm import chat, stream_chat
+from app.core.turn_budget import turn_budget, estimate_tokens
+from app.core.resilience import time_budget, PATIENT_TURN_BUDGET
+from app.core import prompts, telemetry
 from app.core import PATIENT_MODEL, EVAL_MODEL
 
+log = logging.getLogger(__name__)
+
 # Emotional and behavioral variations for fallback
 EMOTIONS = ["worried", "anxious", "irritated", "relieved", "tearful", "stoical", "confused", "concerned"]
 PERSONALITY_TRAITS = ["reserved", "chatty", "curious", "analytical", "dramatic", "humorous", "sarcastic"]
 COPING_STYLES = ["stoical", "denial", "humor", "anger", "bargaining", "spiritual"]
 
-def initialize_patient_state(case: dict) -> dict:
-    """Create a persistent state for the patient that won't change during the session"""
-    return {
-        "repeat_questions": set(),  # track repeated questions
-        "question_count": 0,
-        "greeting_done": False,
-        "context_generated": False  # Whether we've generated rich context yet
-    }
+# Conversation window for patient requests
+HISTORY_KEEP_TURNS   = 6      # most recent exchanges sent verbatim
+HISTORY_FOLD_TURNS   = 4      # older exchanges are folded into the summary this many at a time
+PROMPT_TOKEN_BUDGET  = 2000   # hard cap on the whole request: system prompt, summary, history and question
+SUMMARY_MAX_TOKENS   = 200
+
+# Summary folds run here, off the student's turn
+_fold_pool = ThreadPoolExecutor(max_workers=4, thread_name_prefix="patient-summary")
+
+SUMMARY_TEMPLATE = """Update the running summary of a doctor-patient consultation.
+Keep every fact the patient has already disclosed and every question the
+doctor has already asked, in at most 120 words, written in the third person.
+
+CURRENT SUMMARY:
+{summary}
+
+NEW EXCHANGES:
+{exchanges}
+
+Output only the updated summary."""
+SUMMARY_PROMPT = prompts.register("patient_summary", SUMMARY_TEMPLATE)
+
+# Added after the history when the student asks the same question again
+REPEAT_NOTE = "The doctor has already asked you this. Answer briefly and show slight frustration."
 
 def generate_personal_context(case: dict) -> dict:
     """Generate a simple personal context for the patient - lightweight version"""
@@ -25,10 +52,12 @@ def generate_personal_context(case: dict) -> dict:
     chief_complaint = case.get("chiefComplaint", "health concerns")
     
     # Check if the case already has personality traits - use those if available
-    if hasattr(case, 'personality') and hasattr(case.personality, 'trait'):
-        traits = [case.personality.trait]
-        coping = case.personality.coping_style if hasattr(case.personality, 'coping_style') else random.choice(COPING_STYLES)
-        backstory = case.backstory if hasattr(case, 'backstory') and case.backstory else ""
+    # (cases reach the patient as model_dump() dicts, so look them up by key)
+    personality = case.get("personality") or {}
+    if personality.get("trait"):
+        traits = [personality["trait"]]
+        coping = personality.get("coping_style") or random.choice(COPING_STYLES)
+        backstory = case.get("backstory") or ""
     else:
         # Generate basic traits if not available in the case
         traits = random.sample(PERSONALITY_TRAITS, 2)
@@ -60,52 +89,53 @@ def post_process_response(response: str) -> str:
         
     return result
 
+class SentenceCutter:
+    """Incremental version of the 3-sentence cut in ``post_process_response``.
+
+    Sentences are counted the same way (non-empty text between periods), so
+    feeding a stream through ``feed`` and post-processing the result gives
+    exactly what post-processing the full reply would have.
+    """
+    def __init__(self, max_sentences: int = 3):
+        self.max_sentences = max_sentences
+        self.sentences = 0
+        self.done = False
+        self._current = ""        # text since the last period
+
+    def feed(self, delta: str) -> str:
+        """Return the part of ``delta`` to keep; sets ``done`` once the limit is hit."""
+        if self.done:
+            return ""
+        kept = []
+        for ch in delta:
+            kept.append(ch)
+            if ch != '.':
+                self._current += ch
+                continue
+            if self._current.strip():
+                self.sentences += 1
+            self._current = ""
+            if self.sentences >= self.max_sentences:
+                self.done = True
+                break
+        return "".join(kept)
+
 def make_json_serializable(obj):
     """Convert non-serializable types to serializable ones"""
-    if isinstance(obj, dict):
+    if isinstance(obj, Mapping):        # includes the read-only station view
         return {k: make_json_serializable(v) for k, v in obj.items()}
-    elif isinstance(obj, list):
+    elif isinstance(obj, (list, tuple)):
         return [make_json_serializable(item) for item in obj]
     elif isinstance(obj, set):
         return list(obj)  # Convert set to list
     else:
         return obj
 
-def simulate(case:dict, history:list, user_msg:str) -> str:
+def build_system_prompt(case:dict, context:dict, language:str) -> str:
+    """Static part of the patient prompt: persona first, then medical details"""
     info = case["patientInfo"]
-    
-    # Create or retrieve patient state
-    if "patient_state" not in case:
-        case["patient_state"] = initialize_patient_state(case)
-    
-    patient_state = case["patient_state"]
-    
-    # Generate context if not already done
-    if not patient_state.get("context_generated", False):
-        patient_state["context"] = generate_personal_context(case)
-        patient_state["context_generated"] = True
-    
-    # Get context info
-    context = patient_state["context"]
     traits = ", ".join(context.get("personality_traits", ["concerned"]))
     
-    # Track repeats and questions
-    is_repeat = user_msg.lower().strip() in patient_state["repeat_questions"]
-    patient_state["repeat_questions"].add(user_msg.lower().strip())
-    patient_state["question_count"] += 1
-    
-    # First interaction flag
-    is_first_turn = not patient_state.get("greeting_done", False) and patient_state["question_count"] == 1
-    if is_first_turn:
-        patient_state["greeting_done"] = True
-    
-    # Detect language from the case or settings
-    language = "en"  # Default to English
-    if "lang" in case:
-        language = case["lang"]
-    elif "settings" in case and "language" in case["settings"]:
-        language = case["settings"]["language"]
-    
     # Language-specific instruction
     language_instruction = ""
     if language == "ar":
@@ -138,13 +168,183 @@ HOW TO RESPOND:
         "medications": case.get("medications", [])
     })
     
-    # Complete system content
-    sys_content = system_prompt + f"\n\n# MEDICAL DETAILS (reference only):\n{json.dumps(serializable_case, indent=2)}"
+    # Complete system content: persona first, then the (equally static) medical details.
+    # Compact, deterministic JSON keeps the bytes identical between builds.
+    return system_prompt + "\n\n# MEDICAL DETAILS (reference only):\n" + json.dumps(
+        serializable_case, ensure_ascii=False, separators=(",", ":"))
+
+def update_summary(summary:str, messages:list) -> str:
+    """Fold ``messages`` into the running summary with one small LLM call"""
+    role_map = {"user": "Doctor", "assistant": "Patient"}
+    exchanges = "\n".join(f"{role_map.get(m['role'], m['role'])}: {m['content']}" for m in messages)
+    try:
+        return chat(
+            [{"role": "user", "content": SUMMARY_PROMPT.render(
+                summary=summary or "(none yet)", exchanges=exchanges)}],
+            model=PATIENT_MODEL,
+            temperature=0,
+            max_tokens=SUMMARY_MAX_TOKENS,
+            caller="patient_summary"
+        ).strip()
+    except Exception as e:
+        # Keep going with a crude summary rather than failing the patient turn
+        log.warning("History summary failed: %s", e)
+        return (summary + "\n" + exchanges)[-SUMMARY_MAX_TOKENS * 4:]
+
+def normalize_question(text:str) -> str:
+    """Case-, punctuation- and spacing-insensitive form of a question"""
+    text = unicodedata.normalize("NFKC", text).casefold()
+    return " ".join(re.sub(r"[^\w\s]", " ", text).split())
+
+class PatientSession:
+    """Everything the simulated patient keeps for one station.
+
+    Created once per station from the case dict and kept in session state:
+    the persona, language, system prompt and turn-budget key are worked out
+    here, so a turn only checks the question for repeats and builds the
+    request.  Repeats are detected on 8-byte hashes of normalized questions.
+    """
+    __slots__ = ("context", "language", "system_prompt", "system_tokens", "budget_key", "question_hashes",
+                 "question_count", "summary", "folded", "fold_job", "last_messages", "prompt_bytes",
+                 "stable_prefix_bytes", "turn_tokens")
+
+    def __init__(self, case:Mapping):
+        self.context = generate_personal_context(case)
+        # Detect language from the case or settings
+        self.language = case.get("lang") or case.get("settings", {}).get("language") or "en"
+        # The system prompt is static for the whole station, so build it once.
+        # Keeping it byte-identical lets provider-side prompt caching hit on every turn.
+        self.system_prompt = build_system_prompt(case, self.context, self.language)
+        self.system_tokens = estimate_tokens(self.system_prompt)
+        # (trait, language) that patient turn budgets are tracked under
+        self.budget_key = ((self.context.get("personality_traits") or ["concerned"])[0], self.language)
+        self.question_hashes = set()
+        self.question_count = 0
+        self.summary = ""               # rolling summary of folded-away turns
+        self.folded = 0                 # history messages already in the summary
+        self.fold_job = None            # background fold: future of (summary, folded)
+        self.last_messages = []
+        self.prompt_bytes = 0           # running totals over the station's requests
+        self.stable_prefix_bytes = 0
+        self.turn_tokens = []
+
+    def observe(self, user_msg:str) -> bool:
+        """Count the question; True if it has been asked before"""
+        digest = hashlib.blake2b(normalize_question(user_msg).encode("utf-8"), digest_size=8).digest()
+        repeat = digest in self.question_hashes
+        self.question_hashes.add(digest)
+        self.question_count += 1
+        return repeat
+
+    def _collect_fold(self):
+        if self.fold_job is None or not self.fold_job.done():
+            return
+        try:
+            self.summary, self.folded = self.fold_job.result()
+        except Exception as e:
+            log.warning("History summary failed: %s", e)
+        self.fold_job = None
+
+    def window_history(self, history:list, budget:int) -> list:
+        """Bounded stand-in for ``history``: rolling summary + the last few turns.
 
-    messages = [{"role": "system", "content": sys_content}] + history + [{"role":"user", "content": user_msg}]
+        Older turns are folded into the summary in chunks of HISTORY_FOLD_TURNS
+        on a background thread; until a fold lands the turn goes ahead with the
+        previous summary and more verbatim turns.  The verbatim tail is then
+        trimmed from the front until summary + tail fit ``budget`` tokens.
+        """
+        if self.folded > len(history):          # history was reset under us
+            self.summary, self.folded, self.fold_job = "", 0, None
+        self._collect_fold()
+        
+        keep = HISTORY_KEEP_TURNS * 2
+        if self.fold_job is None and len(history) - self.folded >= keep + HISTORY_FOLD_TURNS * 2:
+            fold_upto = len(history) - keep
+            summary, evicted = self.summary, history[self.folded:fold_upto]
+            self.fold_job = _fold_pool.submit(lambda: (update_summary(summary, evicted), fold_upto))
+        
+        head = [{"role": "system", "content": f"Earlier in this consultation: {self.summary}"}] if self.summary else []
+        budget -= sum(estimate_tokens(m["content"]) for m in head)
+        recent = history[self.folded:]
+        sizes = [estimate_tokens(m["content"]) for m in recent]
+        used = sum(sizes)
+        start = 0
+        while start < len(recent) and used > budget:
+            used -= sizes[start]
+            start += 1
+        return head + recent[start:]
+
+    def build_messages(self, history:list, user_msg:str) -> list:
+        """Build the chat request for this turn, within PROMPT_TOKEN_BUDGET"""
+        repeat = self.observe(user_msg)
+        tail = ([{"role": "system", "content": REPEAT_NOTE}] if repeat else []) + [{"role": "user", "content": user_msg}]
+        budget = PROMPT_TOKEN_BUDGET - self.system_tokens - sum(estimate_tokens(m["content"]) for m in tail)
+        # Static prompt first, then the bounded conversation, then the new question
+        messages = [{"role": "system", "content": self.system_prompt}] + self.window_history(history, budget) + tail
+        self.track_prompt_prefix(messages)
+        return messages
+
+    def track_prompt_prefix(self, messages:list):
+        """Count the request's UTF-8 bytes and how many are unchanged since the previous turn.
+
+        Totals are kept on the session and reported as the ``patient_prompt_bytes``
+        telemetry counter ("total" and "stable_prefix").
+        """
+        total = stable = 0
+        unchanged = True
+        for i, current in enumerate(messages):
+            size = len(current["content"].encode("utf-8"))
+            total += size
+            unchanged = unchanged and i < len(self.last_messages) and self.last_messages[i] == current
+            if unchanged:
+                stable += size
+        self.last_messages = messages
+        self.prompt_bytes += total
+        self.stable_prefix_bytes += stable
+        telemetry.count("patient_prompt_bytes", "total", total)
+        telemetry.count("patient_prompt_bytes", "stable_prefix", stable)
 
-    # Use PATIENT_MODEL (gpt-4.1-mini) with higher max_tokens
-    response = chat(messages, model=PATIENT_MODEL, temperature=0.7, max_tokens=300)
+    def record_turn(self, generated:int, reply:str, budget:int):
+        record = turn_budget.record(*self.budget_key, generated=generated, kept=estimate_tokens(reply), budget=budget)
+        self.turn_tokens.append(record)
+
+@time_budget(PATIENT_TURN_BUDGET)
+def simulate(session:PatientSession, history:list, user_msg:str) -> str:
+    messages = session.build_messages(history, user_msg)
+    params = turn_budget.params(*session.budget_key)
+    
+    # max_tokens is sized from what replies of this trait/language actually keep
+    response = chat(messages, model=PATIENT_MODEL, temperature=0.7, caller="patient", **params)
     
     # Post-process to fix any issues
-    return post_process_response(response) 
\ No newline at end of file
+    reply = post_process_response(response)
+    session.record_turn(estimate_tokens(response), reply, params["max_tokens"])
+    return reply
+
+def simulate_stream(session:PatientSession, history:list, user_msg:str):
+    """Streaming variant of ``simulate`` that yields reply text as it arrives.
+
+    The stream is closed (and the request cancelled) as soon as the third
+    sentence ends.  Pass the joined deltas through ``post_process_response``
+    to get the same final reply ``simulate`` returns.
+    """
+    with time_budget(PATIENT_TURN_BUDGET):
+        messages = session.build_messages(history, user_msg)
+        params = turn_budget.params(*session.budget_key)
+        stream = stream_chat(messages, model=PATIENT_MODEL, temperature=0.7, caller="patient", **params)
+    cutter = SentenceCutter()
+    generated, kept = [], []
+    try:
+        for delta in stream:
+            generated.append(delta)
+            piece = cutter.feed(delta)
+            if piece:
+                kept.append(piece)
+                yield piece
+            if cutter.done:
+                break
+    finally:
+        stream.close()
+        # Same estimator for both sides, as in simulate(): only their ratio is reported
+        session.record_turn(estimate_tokens("".join(generated)), post_process_response("".join(kept)),
+                            params["max_tokens"])
@@ -0,0 +1,73 @@
+"""
+Background prefetch of exam stations.
+Station 1 is generated up front; the remaining stations are produced by a
+worker pool while the student is already working through the first one.
+Usage:
+    from app.core.prefetch import StationPrefetcher
+    pf = StationPrefetcher(n=5, start=1, lang="en", settings=cfg)
+    case = pf.get(2)        # blocks only if station 3 isn't ready yet
+"""
+import queue
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from app.core.case_generator import generate_case, CASE_GEN_WORKERS
+
+class StationPrefetcher:
+    """Generate stations ``start..n-1`` for one session in the background.
+
+    Finished jobs are pushed onto a thread-safe queue as ``(index, future)``
+    pairs; the consumer drains it on demand, so stations can complete in any
+    order while ``get`` still hands them out by index.
+    """
+
+    def __init__(self, n:int, start:int=1, lang:str="en", settings:dict=None,
+                 max_workers:int|None=None):
+        self.n = n
+        self.start = start
+        self._queue = queue.Queue()
+        self._ready = {}
+        self._lock = threading.Lock()
+
+        workers = max(1, min(n - start, max_workers or CASE_GEN_WORKERS))
+        self._pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="prefetch")
+        # Submitted in station order, so the next station is always started first
+        for i in range(start, n):
+            job = self._pool.submit(generate_case, lang=lang, chief_override=None, settings=settings)
+            job.add_done_callback(lambda f, i=i: self._queue.put((i, f)))
+        self._pool.shutdown(wait=False)
+
+    def _drain(self):
+        while True:
+            try:
+                i, job = self._queue.get_nowait()
+            except queue.Empty:
+                return
+            self._ready[i] = job
+
+    def ready(self, index:int) -> bool:
+        """True if station ``index`` has finished (successfully or not)."""
+        with self._lock:
+            self._drain()
+            return index in self._ready
+
+    def get(self, index:int, timeout:float|None=None):
+        """Return station ``index``, waiting for the producer if necessary.
+
+        Re-raises the generation error if the background job failed and
+        ``queue.Empty`` if ``timeout`` expires first.
+        """
+        if not self.start <= index < self.n:
+            raise IndexError(f"station {index} is not prefetched")
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._lock:
+            self._drain()
+            while index not in self._ready:
+                wait = None if deadline is None else max(0.0, deadline - time.monotonic())
+                i, job = self._queue.get(timeout=wait)
+                self._ready[i] = job
+        return self._ready[index].result()
+
+    def cancel(self):
+        """Drop stations that haven't started generating yet."""
+        self._pool.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,94 @@
+"""
+Registry of precompiled prompt templates.
+Static fields (schemas, checklists) are substituted once at import, so a
+request only joins the precompiled text with its dynamic values.  Templates
+keep their static text first so repeated requests share a long identical
+prefix, which the provider's prompt caching can reuse.  Every render is
+counted for per-template size accounting.
+Usage:
+    from app.core import prompts
+    CASE_PROMPT = prompts.register("case_gen", DIRECT_JSON_TEMPLATE, schema=prompts.minify_schema(s))
+    text = CASE_PROMPT.render(lang="en", name="Sara", ...)
+    prompts.prompt_stats()     # {"case_gen": {"renders": 12, "mean_chars": 5210, ...}}
+"""
+import json
+import string
+import threading
+
+def minify_json(obj) -> str:
+    return json.dumps(obj, ensure_ascii=False, separators=(",", ":"))
+
+def minify_schema(schema:dict) -> str:
+    """Compact JSON schema without the auto-generated ``title`` labels."""
+    def strip(node, in_properties=False):
+        if isinstance(node, dict):
+            return {k: strip(v, not in_properties and k in ("properties", "$defs")) for k, v in node.items()
+                    if in_properties or not (k == "title" and isinstance(v, str))}
+        if isinstance(node, list):
+            return [strip(v) for v in node]
+        return node
+    return minify_json(strip(schema))
+
+class PromptTemplate:
+    """A ``str.format``-style template with its static fields already filled in."""
+
+    def __init__(self, name:str, template:str, **static):
+        self.name = name
+        self._parts = []                # [(literal, dynamic field or None)]
+        literal = []
+        for text, field, spec, conv in string.Formatter().parse(template):
+            literal.append(text)
+            if field is None:
+                continue
+            if spec or conv:
+                raise ValueError(f"{name}: format specs are not supported ({field})")
+            if field in static:
+                literal.append(str(static[field]))
+            else:
+                self._parts.append(("".join(literal), field))
+                literal = []
+        self._parts.append(("".join(literal), None))
+        self.fields = tuple(f for _, f in self._parts if f)
+        self.static_chars = sum(len(text) for text, _ in self._parts)
+        self.prefix_chars = len(self._parts[0][0])      # identical for every request
+        self._lock = threading.Lock()
+        self.renders = 0
+        self.rendered_chars = 0
+
+    def render(self, **values) -> str:
+        out = []
+        for text, field in self._parts:
+            out.append(text)
+            if field is not None:
+                out.append(str(values[field]))
+        prompt = "".join(out)
+        with self._lock:
+            self.renders += 1
+            self.rendered_chars += len(prompt)
+        return prompt
+
+    def stats(self) -> dict:
+        with self._lock:
+            renders, chars = self.renders, self.rendered_chars
+        mean = chars / renders if renders else 0
+        return {
+            "renders": renders,
+            "static_chars": self.static_chars,
+            "prefix_chars": self.prefix_chars,
+            "mean_chars": round(mean),
+            "mean_tokens": round(mean / 4),
+            "prefix_share": round(self.prefix_chars / mean, 3) if mean else 0.0,
+        }
+
+_registry = {}
+
+def register(name:str, template:str, **static) -> PromptTemplate:
+    _registry[name] = PromptTemplate(name, template, **static)
+    return _registry[name]
+
+def get(name:str) -> PromptTemplate:
+    return _registry[name]
+
+def prompt_stats() -> dict:
+    """Size accounting for every registered template."""
+    return {name: t.stats() for name, t in sorted(_registry.items())}
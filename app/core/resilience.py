@@ -0,0 +1,258 @@
+"""
+Retry, fallback and deadline policy for LLM calls.
+Errors are classified first; only transient classes are retried, each a
+bounded number of times.  Every model has its own per-attempt deadline and
+circuit breaker, and a whole user action (a patient turn, generating a
+case, scoring a station) shares one time budget across all of its calls.
+Usage:
+    from app.core.resilience import time_budget
+    with time_budget(20):                 # every LLM call inside shares 20 s
+        reply = simulate(case, history, msg)
+"""
+import asyncio
+import contextlib
+import contextvars
+import json
+import logging
+import os
+import random
+import threading
+import time
+import openai
+
+log = logging.getLogger(__name__)
+
+# Retries per error class on the same model before moving to the fallback
+RETRIES = {
+    "rate_limit": 3,
+    "timeout": 1,
+    "server": 1,
+    "connection": 1,
+    "json": 1,
+}
+FATAL = ("bad_request", "auth")     # same request would fail again on any model
+# Only these say the model itself is unhealthy; rate limits and bad JSON don't open its breaker
+BREAKER_KINDS = ("timeout", "connection", "server")
+
+BACKOFF_BASE = float(os.getenv("OSCE_LLM_BACKOFF_BASE", "0.5"))    # seconds
+BACKOFF_MAX  = float(os.getenv("OSCE_LLM_BACKOFF_MAX", "8"))
+
+# Per-attempt deadlines (seconds); OSCE_LLM_DEADLINES="gpt-4.1-nano=15,gpt-4.1=60"
+DEFAULT_DEADLINE = float(os.getenv("OSCE_LLM_DEFAULT_DEADLINE", "60"))
+MODEL_DEADLINES = {
+    "gpt-4.1-nano": 20,
+    "gpt-4.1-mini": 45,
+    "gpt-4o-mini": 60,
+    "gpt-4.1": 60,
+}
+for _item in filter(None, os.getenv("OSCE_LLM_DEADLINES", "").split(",")):
+    _model, _, _secs = _item.partition("=")
+    MODEL_DEADLINES[_model.strip()] = float(_secs)
+
+# Time budget for one user action, and for a bare call outside any action
+PATIENT_TURN_BUDGET = float(os.getenv("OSCE_PATIENT_TURN_BUDGET", "25"))
+CASE_GEN_BUDGET     = float(os.getenv("OSCE_CASE_GEN_BUDGET", "120"))
+SCORING_BUDGET      = float(os.getenv("OSCE_SCORING_BUDGET", "150"))
+CALL_BUDGET         = float(os.getenv("OSCE_LLM_CALL_BUDGET", "120"))
+
+BREAKER_FAILURES = int(os.getenv("OSCE_BREAKER_FAILURES", "5"))      # consecutive failures to open
+BREAKER_COOLDOWN = float(os.getenv("OSCE_BREAKER_COOLDOWN", "30"))   # seconds before a probe
+
+class BudgetExceeded(TimeoutError):
+    """The action's time budget ran out before any model answered."""
+
+class CircuitOpen(RuntimeError):
+    """The model's circuit breaker is open; the call was not attempted."""
+
+class MalformedJSON(ValueError):
+    """A JSON-mode completion that does not parse."""
+
+def classify(exc:BaseException) -> str:
+    if isinstance(exc, openai.RateLimitError):
+        return "rate_limit"
+    if isinstance(exc, (openai.APITimeoutError, asyncio.TimeoutError, TimeoutError)):
+        return "timeout"
+    if isinstance(exc, openai.APIConnectionError):
+        return "connection"
+    if isinstance(exc, (openai.AuthenticationError, openai.PermissionDeniedError)):
+        return "auth"
+    if isinstance(exc, (openai.BadRequestError, openai.NotFoundError, openai.UnprocessableEntityError)):
+        return "bad_request"
+    if isinstance(exc, openai.APIStatusError):
+        return "rate_limit" if exc.status_code == 429 else "server"
+    if isinstance(exc, (MalformedJSON, json.JSONDecodeError)):
+        return "json"
+    if isinstance(exc, CircuitOpen):
+        return "circuit_open"
+    return "server"
+
+def check_json(text:str) -> str:
+    try:
+        json.loads(text)
+    except (TypeError, ValueError) as e:
+        raise MalformedJSON(f"unparseable JSON completion: {e}") from e
+    return text
+
+def retry_delay(exc:BaseException, attempt:int) -> float:
+    """Provider's Retry-After if given, else capped exponential backoff with jitter.
+
+    Retry-After is honoured as given; the action budget decides whether
+    waiting that long is worth it.
+    """
+    response = getattr(exc, "response", None)
+    header = response.headers.get("retry-after") if response is not None else None
+    try:
+        if header is not None:
+            return max(0.0, float(header))
+    except ValueError:
+        pass
+    return random.uniform(0.5, 1.0) * min(BACKOFF_MAX, BACKOFF_BASE * 2 ** (attempt - 1))
+
+class CircuitBreaker:
+    """Closed -> open after N consecutive failures -> half-open probe after a cooldown."""
+
+    def __init__(self, model:str, failures:int=BREAKER_FAILURES, cooldown:float=BREAKER_COOLDOWN):
+        self.model = model
+        self.failures = failures
+        self.cooldown = cooldown
+        self.consecutive = 0
+        self.opened_at = None
+        self._probing = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self) -> str:
+        if self.opened_at is None:
+            return "closed"
+        return "half_open" if time.monotonic() - self.opened_at >= self.cooldown else "open"
+
+    def allow(self) -> bool:
+        with self._lock:
+            state = self.state
+            if state == "closed":
+                return True
+            if state == "half_open" and not self._probing:
+                self._probing = True            # let exactly one request probe
+                return True
+            return False
+
+    def success(self):
+        with self._lock:
+            if self.opened_at is not None:
+                log.info("Circuit for %s closed again", self.model)
+            self.consecutive, self.opened_at, self._probing = 0, None, False
+
+    def failure(self):
+        with self._lock:
+            self.consecutive += 1
+            if self._probing or (self.opened_at is None and self.consecutive >= self.failures):
+                log.warning("Circuit for %s opened after %d consecutive failures", self.model, self.consecutive)
+                self.opened_at = time.monotonic()
+            self._probing = False
+
+    def release(self):
+        """The attempt was abandoned (cancelled) without an outcome."""
+        with self._lock:
+            self._probing = False
+
+_breakers = {}
+_breakers_lock = threading.Lock()
+
+def breaker(model:str) -> CircuitBreaker:
+    with _breakers_lock:
+        if model not in _breakers:
+            _breakers[model] = CircuitBreaker(model)
+        return _breakers[model]
+
+def breaker_states() -> dict:
+    with _breakers_lock:
+        return {m: b.state for m, b in _breakers.items()}
+
+_deadline = contextvars.ContextVar("llm_deadline", default=None)
+
+@contextlib.contextmanager
+def time_budget(seconds:float):
+    """Every LLM call in this block shares ``seconds``; nested budgets only shrink it."""
+    deadline = time.monotonic() + seconds
+    outer = _deadline.get()
+    token = _deadline.set(deadline if outer is None else min(outer, deadline))
+    try:
+        yield
+    finally:
+        _deadline.reset(token)
+
+def current_deadline() -> float:
+    """Absolute (monotonic) deadline for a call made now from this context."""
+    return _deadline.get() or time.monotonic() + CALL_BUDGET
+
+async def call_with_policy(attempt, model:str, fallback:str, deadline:float, record:dict|None=None,
+                           admit=None):
+    """Run ``await attempt(model)`` under the retry/fallback policy.
+
+    Tries ``model`` and then ``fallback``, skipping any whose breaker is
+    open.  Fatal errors are raised at once; when the budget runs out the
+    last underlying error is raised (``BudgetExceeded`` if there was none).
+    ``await admit(model)`` runs before each attempt (e.g. to wait for a
+    rate-limit slot); it uses the action budget but not the model deadline.
+    """
+    last = None
+    for m in dict.fromkeys([model, fallback]):
+        if deadline - time.monotonic() <= 0:        # before allow(): don't take a probe we can't use
+            raise last or BudgetExceeded(f"no time left in the action budget for {m}")
+        b = breaker(m)
+        if not b.allow():
+            last = CircuitOpen(f"circuit for {m} is open")
+            log.warning("Skipping %s: circuit open", m)
+            continue
+        tries = 0
+        settled = False             # the breaker has been told how the last attempt went
+        try:
+            while True:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    raise last or BudgetExceeded(f"no time left in the action budget for {m}")
+                tries += 1
+                if admit is not None:
+                    try:
+                        await asyncio.wait_for(admit(m), timeout=remaining)
+                    except asyncio.TimeoutError:
+                        raise last or BudgetExceeded(f"action budget ran out queued for {m}") from None
+                    remaining = deadline - time.monotonic()
+                settled = False
+                if m != model and record is not None:
+                    record["fallback"] = True   # only once the fallback is actually tried
+                model_deadline = MODEL_DEADLINES.get(m, DEFAULT_DEADLINE)
+                try:
+                    result = await asyncio.wait_for(attempt(m), timeout=min(model_deadline, remaining))
+                except Exception as e:
+                    kind = classify(e)
+                    if record is not None:
+                        record["error"] = kind
+                    if kind in FATAL:
+                        raise
+                    # A timeout only says the model is slow if its own deadline, not the action budget, cut it off
+                    budget_cut = kind == "timeout" and remaining < model_deadline
+                    if kind in BREAKER_KINDS and not budget_cut:
+                        b.failure()
+                        settled = True
+                    else:
+                        b.release()         # says nothing about the model's health
+                    last = e
+                    delay = retry_delay(e, tries)
+                    if tries > RETRIES.get(kind, 0) or b.state == "open" or delay >= deadline - time.monotonic():
+                        log.warning("%s failed (%s: %s), giving up on it", m, kind, e)
+                        break
+                    log.warning("%s failed (%s: %s), retry %d in %.1fs", m, kind, e, tries, delay)
+                    if record is not None:
+                        record["retries"] += 1
+                    await asyncio.sleep(delay)
+                else:
+                    b.success()
+                    settled = True
+                    if record is not None:
+                        record["error"] = None
+                    return result
+        finally:
+            if not settled:
+                b.release()                 # hand back a half-open probe nobody reported on
+    raise last
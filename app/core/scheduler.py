@@ -0,0 +1,181 @@
+"""
+Client-side rate limiting shared by every session in the process.
+Each model gets a request bucket and a token bucket.  Requests wait in a
+priority queue until both buckets can pay for them: interactive patient
+turns go first and may use the whole bucket, while case generation and
+scoring are held back from a reserve kept free for interactive work.
+All requests run on the LLM layer's private event loop, so the scheduler
+lives on that loop and needs no locks.
+Usage:
+    from app.core.scheduler import get_scheduler, priority_for
+    wait = await get_scheduler().acquire(model, est_tokens, priority_for(caller))
+"""
+import asyncio
+import heapq
+import itertools
+import logging
+import os
+import time
+from collections import defaultdict
+
+log = logging.getLogger(__name__)
+
+INTERACTIVE, FOREGROUND, BACKGROUND = 0, 1, 2
+
+# Caller label prefix -> priority class (first match wins)
+CALLER_PRIORITIES = [
+    ("patient", INTERACTIVE),
+    ("pool_fill", BACKGROUND),
+    ("case_gen", FOREGROUND),
+    ("scoring", BACKGROUND),
+    ("fallback", BACKGROUND),
+]
+
+# Requests and tokens per minute per model; OSCE_RATE_LIMITS="gpt-4.1=500:30000,..." or "off"
+RATE_LIMITS = {
+    "gpt-4.1-nano": (500, 200_000),
+    "gpt-4.1-mini": (500, 200_000),
+    "gpt-4o-mini": (500, 200_000),
+    "gpt-4.1": (500, 30_000),
+}
+DEFAULT_LIMIT = (500, 100_000)
+RATE_LIMITS_ENV = os.getenv("OSCE_RATE_LIMITS", "")
+for _item in filter(None, RATE_LIMITS_ENV.split(",")):
+    if _item.strip() == "off":
+        break
+    _model, _, _limits = _item.partition("=")
+    _rpm, _, _tpm = _limits.partition(":")
+    RATE_LIMITS[_model.strip()] = (int(_rpm), int(_tpm))
+ENABLED = RATE_LIMITS_ENV.strip() != "off"
+
+BURST_SECONDS      = float(os.getenv("OSCE_RATE_BURST", "10"))       # bucket size, in seconds of rate
+INTERACTIVE_RESERVE = float(os.getenv("OSCE_RATE_RESERVE", "0.2"))   # share only interactive calls may use
+DEFAULT_COMPLETION = 512            # completion tokens assumed when max_tokens isn't given
+
+def reserve_for(priority:int) -> float:
+    """Share of each bucket that ``priority`` must leave free."""
+    return 0.0 if priority == INTERACTIVE else INTERACTIVE_RESERVE
+
+def priority_for(caller:str) -> int:
+    for prefix, priority in CALLER_PRIORITIES:
+        if caller.startswith(prefix):
+            return priority
+    return FOREGROUND
+
+def estimate_request_tokens(messages:list, kw:dict) -> int:
+    prompt = sum(len(m.get("content") or "") for m in messages) // 4
+    return prompt + int(kw.get("max_tokens") or DEFAULT_COMPLETION)
+
+class TokenBucket:
+    def __init__(self, per_minute:float, burst_seconds:float=BURST_SECONDS):
+        self.rate = per_minute / 60.0
+        self.capacity = max(1.0, self.rate * burst_seconds)
+        self.level = self.capacity
+        self.updated = time.monotonic()
+
+    def refill(self):
+        now = time.monotonic()
+        self.level = min(self.capacity, self.level + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self, amount:float, floor:float=0.0) -> float:
+        """Seconds until ``amount`` can be taken leaving at least ``floor``."""
+        self.refill()
+        missing = amount + floor - self.level
+        return max(0.0, missing / self.rate)
+
+class ModelLimiter:
+    """Request + token buckets and a priority queue of waiters for one model."""
+
+    def __init__(self, model:str, rpm:int, tpm:int):
+        self.model = model
+        self.requests = TokenBucket(rpm)
+        self.tokens = TokenBucket(tpm)
+        self._waiters = []              # heap of (priority, seq, tokens, future)
+        self._seq = itertools.count()
+        self._timer = None
+
+    @staticmethod
+    def _cost(bucket:TokenBucket, amount:float, priority:int) -> float:
+        """Never wait for more than the part of a full bucket ``priority`` may use,
+        or a large request would never be admitted and block the queue behind it."""
+        return min(amount, bucket.capacity * (1 - reserve_for(priority)))
+
+    def _wait_time(self, priority:int, tokens:int) -> float:
+        reserve = reserve_for(priority)
+        return max(self.requests.wait_time(self._cost(self.requests, 1, priority), reserve * self.requests.capacity),
+                   self.tokens.wait_time(self._cost(self.tokens, tokens, priority), reserve * self.tokens.capacity))
+
+    def _dispatch(self):
+        self._timer = None
+        while self._waiters:
+            priority, _, tokens, future = self._waiters[0]
+            if future.done():                       # cancelled while queued
+                heapq.heappop(self._waiters)
+                continue
+            wait = self._wait_time(priority, tokens)
+            if wait > 0:
+                self._timer = asyncio.get_running_loop().call_later(wait, self._dispatch)
+                return
+            heapq.heappop(self._waiters)
+            self.requests.level -= self._cost(self.requests, 1, priority)
+            self.tokens.level -= self._cost(self.tokens, tokens, priority)
+            future.set_result(None)
+
+    async def acquire(self, tokens:int, priority:int) -> float:
+        """Wait for a slot; returns the seconds spent queued."""
+        start = time.monotonic()
+        future = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._waiters, (priority, next(self._seq), tokens, future))
+        if self._timer is not None:
+            self._timer.cancel()                    # a new head may be admissible sooner
+        self._dispatch()
+        await future
+        return time.monotonic() - start
+
+    def settle(self, estimated:int, actual:int, priority:int=FOREGROUND):
+        """Correct the token bucket once the real usage is known."""
+        self.tokens.refill()
+        charged = self._cost(self.tokens, estimated, priority)
+        self.tokens.level = min(self.tokens.capacity, self.tokens.level + charged - actual)
+
+    def depth(self) -> int:
+        return sum(not f.done() for *_, f in self._waiters)
+
+class Scheduler:
+    def __init__(self):
+        self._limiters = {}
+        self.waits = defaultdict(lambda: {"count": 0, "total_s": 0.0, "max_s": 0.0})
+
+    def limiter(self, model:str) -> ModelLimiter:
+        if model not in self._limiters:
+            self._limiters[model] = ModelLimiter(model, *RATE_LIMITS.get(model, DEFAULT_LIMIT))
+        return self._limiters[model]
+
+    async def acquire(self, model:str, tokens:int, priority:int) -> float:
+        if not ENABLED:
+            return 0.0
+        wait = await self.limiter(model).acquire(tokens, priority)
+        stats = self.waits[priority]
+        stats["count"] += 1
+        stats["total_s"] += wait
+        stats["max_s"] = max(stats["max_s"], wait)
+        if wait > 1:
+            log.info("Waited %.1fs for a %s rate-limit slot (priority %d)", wait, model, priority)
+        return wait
+
+    def settle(self, model:str, estimated:int, actual:int, priority:int=FOREGROUND):
+        if ENABLED and actual:
+            self.limiter(model).settle(estimated, actual, priority)
+
+    def stats(self) -> dict:
+        """Queue depth per model and queue-wait totals per priority class."""
+        return {
+            "queued": {m: l.depth() for m, l in self._limiters.items()},
+            "waits": {p: dict(s) for p, s in sorted(self.waits.items())},
+        }
+
+_scheduler = Scheduler()
+
+def get_scheduler() -> Scheduler:
+    return _scheduler
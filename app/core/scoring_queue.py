@@ -0,0 +1,78 @@
+"""
+Background scoring jobs, one per station.
+Grading runs on a worker pool while the student moves on to the next
+station; results are written back by station index, never by finish order.
+Usage:
+    from app.core.scoring_queue import ScoringQueue
+    q = ScoringQueue()
+    q.submit(0, scorer.finalize, chat, candidate_dx=dx)    # returns immediately
+    q.collect(st.session_state.results)        # fill in whatever has finished
+"""
+import logging
+import os
+from concurrent.futures import ThreadPoolExecutor, wait
+from app.core.checklist import CHECKLIST_ITEMS
+
+log = logging.getLogger(__name__)
+
+SCORING_WORKERS = int(os.getenv("OSCE_SCORING_WORKERS", "8"))
+
+_pool = ThreadPoolExecutor(max_workers=SCORING_WORKERS, thread_name_prefix="scoring")
+
+def failed_result(candidate_dx:str="") -> dict:
+    """Result shown for a station whose scoring job crashed."""
+    return {
+        "percent": 0,
+        "comments": "The scoring process encountered issues. Please review the transcript manually.",
+        "scores": [0] * len(CHECKLIST_ITEMS),
+        "item_comments": ["Score not available"] * len(CHECKLIST_ITEMS),
+        "candidate_dx": candidate_dx,
+        "diagnosis_score": 0,
+        "scoring_failed": True
+    }
+
+class ScoringQueue:
+    """Scoring jobs for one session, keyed by station index."""
+
+    def __init__(self):
+        self._jobs = {}
+        self._dx = {}               # diagnosis per station, kept for a failed job's placeholder
+
+    def submit(self, index:int, fn, *args, candidate_dx:str="", **kw):
+        """Start scoring station ``index``; a second submit for it is a no-op.
+
+        ``fn`` is called with ``candidate_dx`` as a keyword argument.
+        """
+        if index not in self._jobs:
+            self._dx[index] = candidate_dx
+            self._jobs[index] = _pool.submit(fn, *args, candidate_dx=candidate_dx, **kw)
+        return self._jobs[index]
+
+    def status(self, index:int) -> str:
+        """'missing', 'pending', 'done' or 'failed'."""
+        job = self._jobs.get(index)
+        if job is None:
+            return "missing"
+        if not job.done():
+            return "pending"
+        return "failed" if job.exception() is not None else "done"
+
+    def pending(self) -> list:
+        return sorted(i for i, job in self._jobs.items() if not job.done())
+
+    def wait(self, indexes=None, timeout:float|None=None):
+        """Block until the given stations (default: all) have finished."""
+        jobs = [self._jobs[i] for i in (self._jobs if indexes is None else indexes) if i in self._jobs]
+        wait(jobs, timeout=timeout)
+
+    def collect(self, results:list) -> list:
+        """Write every finished job into ``results[index]``."""
+        for i, job in self._jobs.items():
+            if not job.done() or i >= len(results):
+                continue
+            if job.exception() is not None:
+                log.error("Scoring station %d failed: %s", i + 1, job.exception())
+                results[i] = failed_result(self._dx.get(i, ""))
+            else:
+                results[i] = job.result()
+        return results
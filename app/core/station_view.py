@@ -0,0 +1,61 @@
+"""
+Read-only forms of a station's case, computed once per station.
+The chat loop only needs the patient-facing fields, and the Exam page only
+needs labs and imaging as table rows, so neither has to dump or revalidate
+the whole ``OsceCase`` on every rerun.
+Usage:
+    from app.core.station_view import StationView
+    view = StationView(station)              # OsceCase or StreamingCase
+    session = PatientSession(view.patient)   # frozen mapping
+    dict_to_table(view.table("labResults"))
+"""
+from types import MappingProxyType
+
+# What app.core.patient reads from a case
+PATIENT_VIEW_FIELDS = (
+    "patientInfo", "chiefComplaint", "personality", "backstory",
+    "historyDetails", "pastMedicalHistory", "medications", "lang",
+)
+
+def freeze(value):
+    """Immutable copy: dicts become read-only mappings and lists tuples."""
+    if isinstance(value, dict):
+        return MappingProxyType({k: freeze(v) for k, v in value.items()})
+    if isinstance(value, (list, tuple)):
+        return tuple(freeze(v) for v in value)
+    return value
+
+def patient_view(case) -> MappingProxyType:
+    """The patient-facing fields of an OsceCase, StreamingCase or case dict."""
+    if isinstance(case, dict):
+        data = case
+    elif hasattr(case, "patient_case"):             # still streaming in
+        data = case.patient_case()
+    else:
+        data = case.model_dump(include=set(PATIENT_VIEW_FIELDS))
+    return freeze({k: data[k] for k in PATIENT_VIEW_FIELDS if k in data})
+
+def table_rows(d:dict) -> tuple:
+    """``(name, value)`` rows ready for display; lists and dicts are shown as text."""
+    return tuple((k, str(v) if isinstance(v, (list, dict)) else v) for k, v in (d or {}).items())
+
+class StationView:
+    """Patient view and result tables for one station, each built on first use."""
+    __slots__ = ("case", "_patient", "_tables")
+
+    def __init__(self, case):
+        self.case = case
+        self._patient = None
+        self._tables = {}
+
+    @property
+    def patient(self) -> MappingProxyType:
+        if self._patient is None:
+            self._patient = patient_view(self.case)
+        return self._patient
+
+    def table(self, name:str) -> tuple:
+        """Rows for ``labResults`` or ``imagingResults``."""
+        if name not in self._tables:
+            self._tables[name] = table_rows(getattr(self.case, name))
+        return self._tables[name]
@@ -0,0 +1,260 @@
+"""
+Structured per-call records for the LLM layer, fanned out to pluggable sinks.
+``app.core.llm`` emits one record per logical call (retries and the fallback
+model included) with caller, model, token counts, latency, retry count and
+whether the fallback model answered.
+Usage:
+    from app.core import telemetry
+    telemetry.add_sink(telemetry.JSONLSink("llm_calls.jsonl"))
+    print(telemetry.stage_summary())          # wall-clock share per caller
+    print(telemetry.get_sink(telemetry.PrometheusSink).render())
+    telemetry.count("case_repairs", "local")   # non-LLM events, rendered as counters
+Sinks are chosen at start-up with OSCE_TELEMETRY, a comma list of
+"ring", "jsonl" and "prometheus" (default "ring").
+"""
+import json
+import logging
+import os
+import threading
+import time
+from collections import defaultdict, deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+log = logging.getLogger(__name__)
+
+TELEMETRY_SINKS = os.getenv("OSCE_TELEMETRY", "ring")
+TELEMETRY_FILE  = os.getenv("OSCE_TELEMETRY_FILE", "llm_calls.jsonl")
+RING_SIZE       = int(os.getenv("OSCE_TELEMETRY_RING", "2000"))     # records kept in memory
+METRICS_PORT    = int(os.getenv("OSCE_METRICS_PORT", "0"))          # 0 = don't serve /metrics
+
+LATENCY_BUCKETS = (0.25, 0.5, 1, 2, 4, 8, 15, 30, 60)
+
+def new_record(caller:str, model:str, *, stream:bool=False) -> dict:
+    return {
+        "ts": time.time(),
+        "caller": caller,
+        "model": model,              # model requested
+        "model_used": model,         # model that actually answered
+        "fallback": False,
+        "stream": stream,
+        "cached": False,
+        "coalesced": False,          # shared an identical in-flight request
+        "prompt_tokens": 0,
+        "completion_tokens": 0,
+        "latency_s": 0.0,
+        "first_token_s": None,       # streams only
+        "retries": 0,
+        "queue_wait_s": 0.0,         # time spent waiting for a rate-limit slot
+        "ok": True,
+        "error": None,
+    }
+
+class JSONLSink:
+    """Appends every record as one JSON line."""
+
+    def __init__(self, path:str):
+        self.path = path
+        self._lock = threading.Lock()
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+
+    def emit(self, record:dict):
+        line = json.dumps(record, ensure_ascii=False) + "\n"
+        with self._lock, open(self.path, "a", encoding="utf-8") as f:
+            f.write(line)
+
+class RingBufferSink:
+    """Keeps the most recent records in memory."""
+
+    def __init__(self, maxlen:int=RING_SIZE):
+        self._records = deque(maxlen=maxlen)
+        self._lock = threading.Lock()
+
+    def emit(self, record:dict):
+        with self._lock:
+            self._records.append(record)
+
+    def records(self, caller:str|None=None) -> list:
+        with self._lock:
+            out = list(self._records)
+        return [r for r in out if caller is None or r["caller"] == caller]
+
+    def clear(self):
+        with self._lock:
+            self._records.clear()
+
+class PrometheusSink:
+    """Aggregates counters and a latency histogram in Prometheus text format."""
+
+    def __init__(self, buckets:tuple=LATENCY_BUCKETS):
+        self.buckets = buckets
+        self._lock = threading.Lock()
+        self._calls = defaultdict(int)          # (caller, model, outcome)
+        self._tokens = defaultdict(int)         # (caller, model, kind)
+        self._retries = defaultdict(int)        # (caller, model)
+        self._fallbacks = defaultdict(int)      # (caller, model)
+        self._queue_wait = defaultdict(float)   # (caller, model)
+        self._hist = defaultdict(lambda: [0] * (len(self.buckets) + 1))
+        self._sum = defaultdict(float)
+
+    def emit(self, record:dict):
+        labels = (record["caller"], record["model_used"])
+        outcome = ("cached" if record["cached"] else "coalesced" if record.get("coalesced")
+                   else "ok" if record["ok"] else "error")
+        with self._lock:
+            self._calls[labels + (outcome,)] += 1
+            self._tokens[labels + ("prompt",)] += record["prompt_tokens"]
+            self._tokens[labels + ("completion",)] += record["completion_tokens"]
+            self._retries[labels] += record["retries"]
+            self._fallbacks[labels] += int(record["fallback"])
+            self._queue_wait[labels] += record.get("queue_wait_s", 0.0)
+            if not record["cached"] and not record.get("coalesced"):
+                counts = self._hist[labels]
+                for i, bound in enumerate(self.buckets):
+                    if record["latency_s"] <= bound:
+                        counts[i] += 1
+                counts[-1] += 1
+                self._sum[labels] += record["latency_s"]
+
+    def render(self) -> str:
+        lbl = lambda caller, model: f'caller="{caller}",model="{model}"'
+        out = ["# TYPE osce_llm_calls_total counter"]
+        with self._lock:
+            out += [f'osce_llm_calls_total{{{lbl(c, m)},outcome="{o}"}} {n}'
+                    for (c, m, o), n in sorted(self._calls.items())]
+            out.append("# TYPE osce_llm_tokens_total counter")
+            out += [f'osce_llm_tokens_total{{{lbl(c, m)},kind="{k}"}} {n}'
+                    for (c, m, k), n in sorted(self._tokens.items())]
+            out.append("# TYPE osce_llm_retries_total counter")
+            out += [f"osce_llm_retries_total{{{lbl(*k)}}} {n}" for k, n in sorted(self._retries.items())]
+            out.append("# TYPE osce_llm_fallbacks_total counter")
+            out += [f"osce_llm_fallbacks_total{{{lbl(*k)}}} {n}" for k, n in sorted(self._fallbacks.items())]
+            out.append("# TYPE osce_llm_queue_wait_seconds_total counter")
+            out += [f"osce_llm_queue_wait_seconds_total{{{lbl(*k)}}} {n:.6f}"
+                    for k, n in sorted(self._queue_wait.items())]
+            out.append("# TYPE osce_llm_latency_seconds histogram")
+            for k, counts in sorted(self._hist.items()):
+                for bound, n in zip(self.buckets, counts):
+                    out.append(f'osce_llm_latency_seconds_bucket{{{lbl(*k)},le="{bound}"}} {n}')
+                out.append(f'osce_llm_latency_seconds_bucket{{{lbl(*k)},le="+Inf"}} {counts[-1]}')
+                out.append(f"osce_llm_latency_seconds_sum{{{lbl(*k)}}} {self._sum[k]:.6f}")
+                out.append(f"osce_llm_latency_seconds_count{{{lbl(*k)}}} {counts[-1]}")
+        for name, outcomes in sorted(counters().items()):
+            out.append(f"# TYPE osce_{name}_total counter")
+            out += [f'osce_{name}_total{{outcome="{o}"}} {n}' for o, n in sorted(outcomes.items())]
+        return "\n".join(out) + "\n"
+
+    def serve(self, port:int):
+        """Expose ``render()`` at http://0.0.0.0:<port>/metrics from a daemon thread."""
+        sink = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.rstrip("/") != "/metrics":
+                    self.send_error(404)
+                    return
+                body = sink.render().encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain; version=0.0.4")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, fmt, *args):
+                log.debug("metrics: " + fmt, *args)
+
+        server = ThreadingHTTPServer(("0.0.0.0", port), Handler)
+        threading.Thread(target=server.serve_forever, name="metrics", daemon=True).start()
+        return server
+
+_sinks = []
+_sinks_lock = threading.Lock()
+
+def add_sink(sink):
+    with _sinks_lock:
+        _sinks.append(sink)
+    return sink
+
+def remove_sink(sink):
+    with _sinks_lock:
+        if sink in _sinks:
+            _sinks.remove(sink)
+
+def get_sink(kind:type):
+    """First registered sink of the given class, or None."""
+    with _sinks_lock:
+        return next((s for s in _sinks if isinstance(s, kind)), None)
+
+def emit(record:dict):
+    log.debug("llm call %s", record)
+    with _sinks_lock:
+        sinks = list(_sinks)
+    for sink in sinks:
+        try:
+            sink.emit(record)
+        except Exception as e:
+            log.warning("Telemetry sink %s failed: %s", type(sink).__name__, e)
+
+_counters = defaultdict(int)         # (name, outcome) for events that aren't LLM calls
+_counters_lock = threading.Lock()
+
+def count(name:str, outcome:str, n:int=1):
+    """Count an application event, e.g. ``count("case_repairs", "local")``."""
+    with _counters_lock:
+        _counters[(name, outcome)] += n
+
+def counters() -> dict:
+    with _counters_lock:
+        items = list(_counters.items())
+    out = defaultdict(dict)
+    for (name, outcome), n in items:
+        out[name][outcome] = n
+    return dict(out)
+
+def stage_summary(records:list|None=None) -> dict:
+    """Calls, tokens and latency per caller, sorted by total wall-clock.
+
+    Uses the ring buffer when ``records`` isn't given.
+    """
+    if records is None:
+        ring = get_sink(RingBufferSink)
+        records = ring.records() if ring else []
+    by_caller = defaultdict(list)
+    for r in records:
+        by_caller[r["caller"]].append(r)
+    total = sum(r["latency_s"] for r in records if not r["cached"] and not r.get("coalesced")) or 1.0
+    out = {}
+    for caller, rs in by_caller.items():
+        sent = [r for r in rs if not r["cached"] and not r.get("coalesced")]
+        lat = sorted(r["latency_s"] for r in sent)
+        waits = sorted(r.get("queue_wait_s", 0.0) for r in sent)
+        out[caller] = {
+            "calls": len(rs),
+            "cached": sum(r["cached"] for r in rs),
+            "coalesced": sum(r.get("coalesced", False) for r in rs),
+            "errors": sum(not r["ok"] for r in rs),
+            "retries": sum(r["retries"] for r in rs),
+            "fallbacks": sum(r["fallback"] for r in rs),
+            "prompt_tokens": sum(r["prompt_tokens"] for r in rs),
+            "completion_tokens": sum(r["completion_tokens"] for r in rs),
+            "latency_p50": lat[len(lat) // 2] if lat else 0.0,
+            "latency_p95": lat[min(len(lat) - 1, int(len(lat) * 0.95))] if lat else 0.0,
+            "queue_wait_p95": waits[min(len(waits) - 1, int(len(waits) * 0.95))] if waits else 0.0,
+            "wall_share": round(sum(lat) / total, 3),
+        }
+    return dict(sorted(out.items(), key=lambda kv: -kv[1]["wall_share"]))
+
+def _configure():
+    for name in (s.strip() for s in TELEMETRY_SINKS.split(",")):
+        if name == "ring":
+            add_sink(RingBufferSink())
+        elif name == "jsonl":
+            add_sink(JSONLSink(TELEMETRY_FILE))
+        elif name == "prometheus":
+            sink = add_sink(PrometheusSink())
+            if METRICS_PORT:
+                sink.serve(METRICS_PORT)
+        elif name and name != "off":
+            log.warning("Unknown telemetry sink %r in OSCE_TELEMETRY", name)
+
+_configure()
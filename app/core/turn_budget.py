@@ -0,0 +1,67 @@
+"""
+Token budgets for patient replies.
+Replies are cut to three sentences by ``post_process_response``, so most of
+a fixed 300-token budget is generated only to be thrown away.  This tracks
+how many tokens kept replies really need, per personality trait and
+language, and sizes ``max_tokens`` for the next request to match.
+Usage:
+    from app.core.turn_budget import turn_budget
+    params = turn_budget.params("anxious", "en")     # max_tokens + stop
+    turn_budget.record("anxious", "en", generated=120, kept=45, budget=params["max_tokens"])
+"""
+import threading
+from collections import defaultdict, deque
+
+DEFAULT_MAX_TOKENS = 300     # used until a trait/language has enough history
+MIN_MAX_TOKENS     = 60      # never squeeze a reply below this
+MIN_SAMPLES        = 5       # turns needed before trusting the observed sizes
+HEADROOM           = 1.3     # margin over the 95th percentile of kept tokens
+WINDOW             = 200     # recent turns remembered per trait/language
+
+# The patient should never start writing the student's side of the dialogue
+STOP_SEQUENCES = ["\nStudent:", "\nDoctor:", "\nUser:"]
+
+def estimate_tokens(text: str) -> int:
+    """Rough token count; UTF-8 bytes / 4 also holds up for Arabic text."""
+    return max(1, round(len(text.encode("utf-8")) / 4)) if text else 0
+
+class TurnBudget:
+    """Process-wide record of generated vs. kept tokens for patient turns."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._kept = defaultdict(lambda: deque(maxlen=WINDOW))
+        self._totals = defaultdict(lambda: {"turns": 0, "generated": 0, "kept": 0})
+
+    def max_tokens(self, trait: str, lang: str) -> int:
+        with self._lock:
+            samples = sorted(self._kept[(trait, lang)])
+        if len(samples) < MIN_SAMPLES:
+            return DEFAULT_MAX_TOKENS
+        p95 = samples[min(len(samples) - 1, int(len(samples) * 0.95))]
+        return max(MIN_MAX_TOKENS, min(DEFAULT_MAX_TOKENS, int(p95 * HEADROOM)))
+
+    def params(self, trait: str, lang: str) -> dict:
+        """Request parameters for the next patient turn."""
+        return {"max_tokens": self.max_tokens(trait, lang), "stop": STOP_SEQUENCES}
+
+    def record(self, trait: str, lang: str, generated: int, kept: int, budget: int) -> dict:
+        """Log one turn and return its record."""
+        with self._lock:
+            self._kept[(trait, lang)].append(kept)
+            totals = self._totals[(trait, lang)]
+            totals["turns"] += 1
+            totals["generated"] += generated
+            totals["kept"] += kept
+        return {"trait": trait, "lang": lang, "generated": generated, "kept": kept, "budget": budget}
+
+    def stats(self) -> dict:
+        """Totals per ``"trait/lang"`` plus the share of generated tokens wasted."""
+        with self._lock:
+            out = {}
+            for (trait, lang), t in self._totals.items():
+                wasted = 1 - t["kept"] / t["generated"] if t["generated"] else 0.0
+                out[f"{trait}/{lang}"] = dict(t, wasted=round(wasted, 3))
+            return out
+
+turn_budget = TurnBudget()
@@ -1,5 +1,6 @@
 import streamlit as st
 import pandas as pd
+from app.core.station_view import table_rows
 
 CSS = """
 <style>
@@ -161,20 +162,14 @@ def inject_css():
     """Apply all CSS styling to the app"""
     st.markdown(CSS, unsafe_allow_html=True)
 
-def dict_to_table(d: dict):
-    """Display a dictionary as a styled table"""
-    if not d:  # Handle empty dict case
+def dict_to_table(d):
+    """Display a dictionary (or its precomputed ``table_rows``) as a styled table"""
+    # Complex values (lists, dicts) are shown as strings to ensure compatibility with Arrow
+    rows = d if isinstance(d, tuple) else table_rows(d)
+    if not rows:  # Handle empty dict case
         return st.info("No data available")
     
-    # Convert any complex values (lists, dicts) to strings to ensure compatibility with Arrow
-    processed_values = {}
-    for key, value in d.items():
-        if isinstance(value, (list, dict)):
-            processed_values[key] = str(value)
-        else:
-            processed_values[key] = value
-    
-    df = pd.DataFrame({"Test": processed_values.keys(), "Result": processed_values.values()})
+    df = pd.DataFrame(rows, columns=["Test", "Result"])
     st.table(df.style.set_table_attributes('class="lab-table"'))
 
 def create_station_nav(total_stations, current_station):
@@ -0,0 +1,224 @@
+"""
+Headless load test: N simulated students through Home -> Exam -> Results.
+Each student is a thread that follows the same code path as a Streamlit
+session: settings as built in Home.py, first station streamed until its
+first fields arrive with the rest prefetched, scripted patient turns streamed through
+``simulate_stream``, scoring queued at station end and the Results page
+aggregation.  Runs against the offline LLM stand-in unless
+OSCE_LLM_BACKEND is already set.
+Usage:
+    python -m benchmarks.loadtest --students 30 --concurrency 30 --stations 3 --turns 8
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+import threading
+import time
+import tracemalloc
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+
+os.environ.setdefault("OSCE_LLM_BACKEND", "offline")
+os.environ.setdefault("OSCE_LOG_LEVEL", "WARNING")
+
+from app.core.case_generator import stream_case, StreamingCase, CORE_FIELDS
+from app.core.prefetch import StationPrefetcher
+from app.core.station_view import StationView
+from app.core.patient import PatientSession, simulate_stream, post_process_response
+from app.core.incremental_eval import IncrementalScorer, _format_messages
+from app.core.evaluator import score, SCORING_MODE
+from app.core.scoring_queue import ScoringQueue
+from app.core import telemetry, prompts, case_repair
+
+QUESTIONS = [
+    "Hello, I'm the doctor today. What brings you in?",
+    "When did this start, and where exactly do you feel it?",
+    "Any fever, weight loss or night sweats?",
+    "Do you take any medication? Any allergies?",
+    "Does anyone in your family have similar problems?",
+    "Do you smoke or drink alcohol? What work do you do?",
+    "Is anything worrying you in particular about this?",
+    "May I examine you? I'll wash my hands first.",
+    "I'm going to check your blood pressure and pulse.",
+    "We'll arrange some blood tests and an X-ray.",
+    "Let me explain the likely diagnosis and treatment options.",
+    "Please come back for follow-up in two weeks. Any questions?",
+]
+
+class Recorder:
+    """Thread-safe latency samples per stage."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.samples = defaultdict(list)
+
+    def add(self, stage:str, seconds:float):
+        with self._lock:
+            self.samples[stage].append(seconds)
+
+    def timed(self, stage:str):
+        recorder = self
+        class _Timer:
+            def __enter__(self):
+                self.t0 = time.perf_counter()
+            def __exit__(self, *exc):
+                recorder.add(stage, time.perf_counter() - self.t0)
+        return _Timer()
+
+def deep_size(obj, seen=None) -> int:
+    """Approximate retained size of a session-state object graph in bytes."""
+    seen = seen if seen is not None else set()
+    if id(obj) in seen:
+        return 0
+    seen.add(id(obj))
+    size = sys.getsizeof(obj)
+    if isinstance(obj, dict):
+        size += sum(deep_size(k, seen) + deep_size(v, seen) for k, v in obj.items())
+    elif isinstance(obj, (list, tuple, set, frozenset)):
+        size += sum(deep_size(v, seen) for v in obj)
+    elif hasattr(obj, "__dict__"):
+        size += deep_size(vars(obj), seen)
+    elif hasattr(obj, "__slots__"):
+        size += sum(deep_size(getattr(obj, s), seen) for s in obj.__slots__ if hasattr(obj, s))
+    return size
+
+def home_settings(rng:random.Random, args) -> dict:
+    """The settings dict exactly as Home.py's Start button builds it."""
+    return dict(
+        n=args.stations,
+        minutes=5,
+        difficulty=rng.randint(1, 5),
+        station_type="Full OSCE",
+        category=rng.choice(["Family Medicine", "Internal Medicine", "Emergency Medicine"]),
+        custom_cc="",
+        age=45,
+        gender="Male",
+        occupation="Varies",
+        fully_random=True,
+        language=args.language,
+    )
+
+def run_student(sid:int, args, rec:Recorder) -> dict:
+    rng = random.Random(args.seed + sid)
+    think = lambda: time.sleep(rng.uniform(0.5, 1.5) * args.think_time * args.time_scale)
+    session = {"settings": home_settings(rng, args), "stations": [], "results": [None] * args.stations}
+    cfg = session["settings"]
+    queue = ScoringQueue()
+
+    # Home.py: first station blocks until its first fields have streamed in, the rest are prefetched
+    with rec.timed("home_first_station"):
+        first = stream_case(lang=cfg["language"], chief_override=None, settings=cfg)
+        if isinstance(first, StreamingCase):
+            first.wait_for(*CORE_FIELDS)
+        session["stations"].append(first)
+    prefetcher = StationPrefetcher(cfg["n"], start=1, lang=cfg["language"], settings=cfg) if cfg["n"] > 1 else None
+
+    for idx in range(cfg["n"]):
+        # Exam.py: load_station()
+        if idx >= len(session["stations"]):
+            with rec.timed("exam_station_wait"):
+                session["stations"].append(prefetcher.get(idx))
+        station = session["stations"][idx]
+        session["view"] = StationView(station)
+        session["patient"] = PatientSession(session["view"].patient)
+        session["chat"] = []
+        scorer = IncrementalScorer() if args.scoring == "incremental" else None
+
+        for q in rng.sample(QUESTIONS, min(args.turns, len(QUESTIONS))):
+            think()
+            session["chat"].append({"role": "user", "content": q})
+            t0 = time.perf_counter()
+            first, parts = None, []
+            for delta in simulate_stream(session["patient"], session["chat"][:-1], q):
+                if first is None:
+                    first = time.perf_counter() - t0
+                parts.append(delta)
+            rec.add("patient_first_token", first if first is not None else time.perf_counter() - t0)
+            rec.add("patient_turn", time.perf_counter() - t0)
+            session["chat"].append({"role": "assistant", "content": post_process_response("".join(parts))})
+            if scorer is not None:
+                scorer.observe(session["chat"])
+
+        if isinstance(station, StreamingCase):
+            with rec.timed("case_stream_tail"):         # still writing after the station's turns?
+                session["stations"][idx] = station.result()
+            rec.add("case_stream_total", station.total_s)
+
+        # finish_station(): queued, the student moves straight on
+        dx = rng.choice(["Stable angina", "Migraine", "", "Pneumonia"])
+        t_submit = time.perf_counter()
+        if args.scoring == "incremental":
+            job = queue.submit(idx, scorer.finalize, list(session["chat"]), candidate_dx=dx,
+                               case=session["stations"][idx])
+        else:
+            transcript = _format_messages(session["chat"])
+            job = queue.submit(idx, score, transcript, candidate_dx=dx, mode=args.scoring)
+        job.add_done_callback(lambda f, t=t_submit: rec.add("station_scoring", time.perf_counter() - t))
+
+    # Results.py: wait for whatever is still grading, then aggregate
+    with rec.timed("results_wait"):
+        queue.wait()
+        queue.collect(session["results"])
+        valid = [r for r in session["results"] if r is not None and not r.get("scoring_failed")]
+        overall = sum(r["percent"] for r in valid) / len(valid) if valid else 0.0
+    session["overall"] = overall
+    return {"session_bytes": deep_size(session), "stations": cfg["n"]}
+
+def pct(values:list, p:float) -> float:
+    values = sorted(values)
+    return values[min(len(values) - 1, max(0, int(round(p / 100 * len(values) + 0.5)) - 1))]
+
+def main():
+    ap = argparse.ArgumentParser(description="OSCE chat load test against the offline LLM stand-in")
+    ap.add_argument("--students", type=int, default=30)
+    ap.add_argument("--concurrency", type=int, default=30, help="students active at once")
+    ap.add_argument("--stations", type=int, default=3)
+    ap.add_argument("--turns", type=int, default=8, help="patient turns per station")
+    ap.add_argument("--think-time", type=float, default=8.0, help="mean seconds between student messages")
+    ap.add_argument("--time-scale", type=float, default=1.0,
+                    help="scale think time (set OSCE_OFFLINE_TIME_SCALE for LLM latency)")
+    ap.add_argument("--scoring", choices=["incremental", "two_stage", "single_pass"], default=SCORING_MODE)
+    ap.add_argument("--language", choices=["en", "ar"], default="en")
+    ap.add_argument("--seed", type=int, default=42)
+    args = ap.parse_args()
+
+    rec = Recorder()
+    tracemalloc.start()
+    t0 = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.concurrency, thread_name_prefix="student") as pool:
+        sessions = list(pool.map(lambda i: run_student(i, args, rec), range(args.students)))
+    wall = time.perf_counter() - t0
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    print(f"\n{args.students} students x {args.stations} stations x {args.turns} turns, "
+          f"concurrency {args.concurrency}, backend {os.environ['OSCE_LLM_BACKEND']}")
+    print(f"{'stage':22s} {'n':>6s} {'p50':>8s} {'p95':>8s} {'p99':>8s} {'max':>8s}")
+    for stage, values in sorted(rec.samples.items()):
+        print(f"{stage:22s} {len(values):6d} {pct(values, 50):8.3f} {pct(values, 95):8.3f} "
+              f"{pct(values, 99):8.3f} {max(values):8.3f}")
+    stations = sum(s["stations"] for s in sessions)
+    turns = len(rec.samples["patient_turn"])
+    print(f"\nwall clock {wall:.1f}s   throughput {stations / wall:.2f} stations/s, {turns / wall:.2f} patient turns/s")
+    print(f"peak traced memory {peak / 1e6:.1f} MB total, {peak / 1e6 / min(args.students, args.concurrency):.2f} MB per concurrent session")
+    print(f"session state at Results page: mean {statistics.mean(s['session_bytes'] for s in sessions) / 1e3:.1f} kB")
+
+    print(f"\n{'LLM caller':22s} {'calls':>6s} {'cached':>6s} {'p50':>8s} {'p95':>8s} {'tokens':>8s} {'share':>6s}")
+    for caller, s in telemetry.stage_summary().items():
+        print(f"{caller:22s} {s['calls']:6d} {s['cached']:6d} {s['latency_p50']:8.3f} {s['latency_p95']:8.3f} "
+              f"{s['prompt_tokens'] + s['completion_tokens']:8d} {s['wall_share']:6.1%}")
+
+    print(f"\n{'prompt template':22s} {'renders':>7s} {'tokens':>7s} {'static prefix':>14s}")
+    for name, p in prompts.prompt_stats().items():
+        if p["renders"]:
+            print(f"{name:22s} {p['renders']:7d} {p['mean_tokens']:7d} {p['prefix_share']:14.0%}")
+
+    r = case_repair.repair_stats()
+    print(f"\ncase validation: {r['valid']} valid, {r['local']} fixed locally, {r['llm']} fixed by LLM, "
+          f"{r['regenerated']} regenerated ({r['retry_ok']} valid on retry), {r['failed']} failed "
+          f"(repair rate {r['repair_rate']:.0%})")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,136 @@
+"""
+Offline benchmark: two-stage vs. single-pass scoring.
+Runs ``evaluator.score`` in both modes against a stub LLM with simulated
+per-call latency, then reports wall-clock per station, LLM calls per
+station and how often the two modes agree item by item.
+Usage:
+    python -m benchmarks.scoring_modes --stations 20 --time-scale 0.05
+"""
+import argparse
+import hashlib
+import json
+import random
+import re
+import statistics
+import time
+
+from app.core import evaluator
+from app.core.checklist import CHECKLIST_ITEMS
+
+QUESTIONS = [
+    "Hello, I'm the doctor on call today, what brings you in?",
+    "When did the pain start and where exactly is it?",
+    "Do you have any fever, night sweats or weight loss?",
+    "Do you take any regular medications? Any allergies?",
+    "Does anyone in your family have heart disease?",
+    "Do you smoke or drink alcohol?",
+    "May I examine you now? I'll wash my hands first.",
+    "I'd like to check your blood pressure and pulse.",
+    "We'll order some blood tests and a chest X-ray.",
+    "I think this is likely angina; let's discuss treatment options.",
+    "How is this affecting your work and home life?",
+    "Please come back in two weeks for follow-up.",
+]
+
+def make_transcript(rng:random.Random, turns:int) -> str:
+    lines = []
+    for q in rng.sample(QUESTIONS, min(turns, len(QUESTIONS))):
+        lines.append(f"Student: {q}")
+        lines.append("Patient: I see, doctor. It has been hard.")
+    return "\n".join(lines)
+
+class StubLLM:
+    """Deterministic examiner: every mode sees the same underlying judgement.
+
+    ``noise`` is the chance a single item is judged differently on a given
+    call, standing in for run-to-run model disagreement.
+    """
+    def __init__(self, base_latency:float, per_token:float, time_scale:float, noise:float, seed:int):
+        self.base_latency = base_latency
+        self.per_token = per_token
+        self.time_scale = time_scale
+        self.noise = noise
+        self.rng = random.Random(seed)
+        self.calls = 0
+
+    def _judge(self, text:str) -> list:
+        digest = hashlib.sha256(text.encode()).digest()
+        scores = []
+        for i in range(len(CHECKLIST_ITEMS)):
+            s = (0, 3, 5)[digest[i % len(digest)] % 3]
+            if self.rng.random() < self.noise:
+                s = self.rng.choice((0, 3, 5))
+            scores.append(s)
+        return scores
+
+    def _sleep(self, out_text:str):
+        tokens = len(out_text) / 4
+        time.sleep((self.base_latency + tokens * self.per_token) * self.time_scale)
+
+    def __call__(self, messages, model, *, json_mode=False, **kw):
+        self.calls += 1
+        prompt = messages[-1]["content"]
+        convo = prompt.split("Conversation (bullet summary):")[-1].split("Student's stated diagnosis")[0]
+        if "Convert the examiner notes" in prompt:
+            notes = prompt.split("NOTES", 1)[1]
+            scores = [int(m.group(1)) for m in re.finditer(r"^\s*(\d)\s+", notes, re.M)]
+            out = json.dumps({
+                "scores": scores,
+                "item_comments": ["stub comment"] * len(scores),
+                "comments": "Stub overall assessment.",
+                "diagnosis_score": 3
+            })
+        elif "<item number>|<score>|" in prompt:
+            scores = self._judge(convo)
+            out = "\n".join(f"{i}|{s}|stub comment" for i, s in enumerate(scores, 1))
+            out += "\nDX|3\nCOMMENTS|Stub overall assessment."
+        elif "WRITE 35 LINES" in prompt:
+            scores = self._judge(convo)
+            out = "\n".join(f"{s}  stub comment" for s in scores)
+        else:
+            raise ValueError("stub LLM got an unexpected prompt")
+        self._sleep(out)
+        return out
+
+def run_mode(mode:str, transcripts:list, stub:StubLLM) -> tuple:
+    results, timings = [], []
+    calls_before = stub.calls
+    for t in transcripts:
+        start = time.perf_counter()
+        results.append(evaluator.score(t, "Stable angina", mode=mode))
+        timings.append((time.perf_counter() - start) / stub.time_scale)
+    return results, timings, (stub.calls - calls_before) / len(transcripts)
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    ap.add_argument("--stations", type=int, default=20)
+    ap.add_argument("--time-scale", type=float, default=0.05,
+                    help="fraction of the simulated latency actually slept")
+    ap.add_argument("--base-latency", type=float, default=0.6, help="seconds per call")
+    ap.add_argument("--per-token", type=float, default=0.012, help="seconds per output token")
+    ap.add_argument("--noise", type=float, default=0.05)
+    ap.add_argument("--seed", type=int, default=7)
+    args = ap.parse_args()
+
+    rng = random.Random(args.seed)
+    transcripts = [make_transcript(rng, rng.randint(4, 12)) for _ in range(args.stations)]
+    stub = StubLLM(args.base_latency, args.per_token, args.time_scale, args.noise, args.seed)
+    evaluator.chat = stub
+    evaluator._score_cache = None       # the persistent score cache would answer later runs from disk
+
+    report = {}
+    for mode in ("two_stage", "single_pass"):
+        results, timings, calls = run_mode(mode, transcripts, stub)
+        report[mode] = (results, timings, calls)
+        print(f"{mode:12s} mean {statistics.mean(timings):6.2f}s  "
+              f"p95 {sorted(timings)[int(len(timings) * 0.95) - 1]:6.2f}s  "
+              f"LLM calls/station {calls:.1f}")
+
+    a, b = report["two_stage"][0], report["single_pass"][0]
+    same = sum(x == y for ra, rb in zip(a, b) for x, y in zip(ra["scores"], rb["scores"]))
+    total = sum(len(ra["scores"]) for ra in a)
+    pct_diff = statistics.mean(abs(ra["percent"] - rb["percent"]) for ra, rb in zip(a, b))
+    print(f"item agreement {same / total:.1%}   mean |percent difference| {pct_diff:.1f} points")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,107 @@
+"""
+Offline micro-benchmark: per-rerun cost of reading a station's case.
+Compares what the Exam page used to do on every rerun or turn (dump the
+whole OsceCase, rebuild result tables, revalidate on assignment, parse
+pooled JSON in Python, validate a pooled case twice on checkout) with the
+precomputed ``StationView`` and single-pass validation.  Also times
+building a pooled case with ``model_construct`` (no validation), which was
+tried and rejected as slower than pydantic's compiled JSON validation.
+Usage:
+    python -m benchmarks.station_views --repeat 2000
+"""
+import argparse
+import json
+import random
+import re
+import time
+
+from pydantic import BaseModel
+
+from app.core.llm_offline import _case_json
+from app.core.name_utils import generate_name
+from app.core.patient import PatientSession
+from app.core.case_pool import rerandomize_patient
+from app.core.schema import OsceCase
+from app.core.station_view import StationView, table_rows
+
+HISTORY = [
+    {"role": "user", "content": "Hello, what brings you in today?"},
+    {"role": "assistant", "content": "I've had this chest pain since yesterday, doctor."},
+]
+QUESTION = "Does the pain go anywhere else?"
+
+def per_op(fn, repeat:int) -> float:
+    """CPU microseconds per call."""
+    fn()
+    start = time.process_time()
+    for _ in range(repeat):
+        fn()
+    return (time.process_time() - start) / repeat * 1e6
+
+def construct_case(data:dict) -> OsceCase:
+    """Unvalidated OsceCase, nested models included."""
+    fields = {}
+    for name, value in data.items():
+        kind = OsceCase.model_fields[name].annotation
+        if isinstance(kind, type) and issubclass(kind, BaseModel) and isinstance(value, dict):
+            value = kind.model_construct(**value)
+        fields[name] = value
+    return OsceCase.model_construct(**fields)
+
+def checkout_twice(text:str) -> OsceCase:
+    """Pool checkout before: validate the file, then dump, edit and validate it again."""
+    case = OsceCase.model_validate_json(text)
+    info = case.patientInfo
+    old_name, old_age = info.name, info.age
+    new_name = generate_name(info.gender, case.lang)
+    new_age = min(95, max(18, old_age + random.randint(-3, 3)))
+    text = case.model_dump_json()
+    if old_name and old_name != new_name:
+        text = text.replace(old_name, new_name)
+        old_first, new_first = old_name.split()[0], new_name.split()[0]
+        text = re.sub(rf"\b{re.escape(old_first)}\b", new_first, text)
+    text = re.sub(rf"\b{old_age}(?=[- ]year)", str(new_age), text)
+    data = json.loads(text)
+    data["patientInfo"]["age"] = new_age
+    return OsceCase.model_validate(data)
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--repeat", type=int, default=2000)
+    ap.add_argument("--seed", type=int, default=7)
+    args = ap.parse_args()
+
+    raw = _case_json("Name: Sara Jones\nAge: 52\nGender: Female\nLanguage: en", random.Random(args.seed))
+    data = json.loads(raw)
+    case = OsceCase.model_validate(data)
+    stored = case.model_dump_json()         # as the case pool writes it
+    view = StationView(case)
+    session = PatientSession(view.patient)
+
+    rows = [
+        ("patient turn", "model_dump + new session", "precomputed view",
+         lambda: PatientSession(case.model_dump()).build_messages(HISTORY, QUESTION),
+         lambda: session.build_messages(HISTORY, QUESTION)),
+        ("lab table", "table_rows per rerun", "view.table",
+         lambda: table_rows(case.labResults),
+         lambda: view.table("labResults")),
+        ("set language", "assign (revalidates)", "validate once",
+         lambda: setattr(OsceCase.model_validate(data), "lang", "en"),
+         lambda: OsceCase.model_validate(dict(data, lang="en"))),
+        ("pooled case", "json.loads + validate", "model_validate_json",
+         lambda: OsceCase.model_validate(json.loads(raw)),
+         lambda: OsceCase.model_validate_json(raw)),
+        ("pooled case", "json.loads + construct", "model_validate_json",
+         lambda: construct_case(json.loads(raw)),
+         lambda: OsceCase.model_validate_json(raw)),
+        ("pool checkout", "validate twice", "rerandomize_patient",
+         lambda: checkout_twice(stored),
+         lambda: rerandomize_patient(stored)),
+    ]
+    print(f"{'operation':<14} {'before':<26} {'µs':>9}   {'after':<20} {'µs':>9}  speedup")
+    for name, before, after, old, new in rows:
+        t_old, t_new = per_op(old, args.repeat), per_op(new, args.repeat)
+        print(f"{name:<14} {before:<26} {t_old:>9.1f}   {after:<20} {t_new:>9.1f}  {t_old / t_new:>6.1f}x")
+
+if __name__ == "__main__":
+    main()
@@ -1,14 +1,19 @@
 import streamlit as st
 import datetime
+import logging
 # ⛑️  guard ---------------------------------------------------------------
 if "stations" not in st.session_state:    # user hit F5 or directly typed /Exam
     st.switch_page("Home.py")             # send them back to setup
 # -----------------------------------------------------------------------
 from app.core.timer import start, remaining
-from app.core.patient import simulate
-from app.core.evaluator import score
+from app.core.patient import PatientSession, simulate_stream, post_process_response
+from app.core.incremental_eval import IncrementalScorer, _format_messages
+from app.core.evaluator import score, SCORING_MODE
 from app.core.ui import inject_css, dict_to_table, format_timer, create_station_nav
-from app.core.case_generator import generate_case
+from app.core.case_generator import stream_case, StreamingCase, CORE_FIELDS, section_available
+from app.core.station_view import StationView
+
+log = logging.getLogger("app.pages.exam")
 
 # Configure page with consistent sidebar handling
 st.set_page_config(
@@ -20,7 +25,58 @@ st.set_page_config(
 
 # Get settings from session state
 cfg = st.session_state.settings
-station = st.session_state.stations[st.session_state.current]
+
+def load_station(index):
+    """Return station ``index``, waiting on the background prefetcher only if it's behind"""
+    stations = st.session_state.stations
+    while st.session_state.get("lazy_generation", False) and len(stations) <= index < cfg["n"]:
+        i = len(stations)
+        prefetcher = st.session_state.get("prefetcher")
+        case = None
+        if prefetcher is not None:
+            try:
+                if prefetcher.ready(i):
+                    case = prefetcher.get(i)
+                else:
+                    with st.spinner("Generating next station..."):
+                        case = prefetcher.get(i)
+            except Exception as e:
+                log.warning("Prefetch of station %d failed: %s", i + 1, e)
+        if case is None:
+            # Lazy path: stream it in; the station opens once the first fields arrive
+            case = stream_case(
+                lang=cfg.get("language", "en"),
+                chief_override=None,
+                settings=cfg
+            )
+        stations.append(case)
+    case = stations[index]
+    if isinstance(case, StreamingCase):
+        if case.succeeded():
+            stations[index] = case = case.result()    # keep the plain case in session state
+        # A station whose deferred sections failed stays a StreamingCase, which knows what is missing
+        elif not all(case.has(f) for f in CORE_FIELDS):
+            with st.spinner("Generating next station..."):
+                case.wait_for(*CORE_FIELDS)
+    return case
+
+def station_table(name, waiting):
+    """Table rows for a field of the current station, waiting (with a spinner) if it is still streaming in.
+    None if it could not be generated."""
+    if isinstance(station, StreamingCase) and not station.has(name):
+        with st.spinner(waiting):
+            station.available(name)
+    if not section_available(station, name):
+        return None
+    return st.session_state.view.table(name)
+
+def show_table(rows, what):
+    if rows is None:
+        st.info(f"{what} are not available for this station.")
+    else:
+        dict_to_table(rows)
+
+station = load_station(st.session_state.current)
 
 # ── initialise per-station state ───────────────────────────
 if "timer" not in st.session_state:
@@ -28,6 +84,11 @@ if "timer" not in st.session_state:
     st.session_state.chat  = []
     st.session_state.lab   = False
     st.session_state.img   = False
+    # Patient view and result tables are built once per station, on first use
+    st.session_state.view = StationView(station)
+    # The patient session is created on the first question (a streamed station may still be writing it)
+    # Checklist marking runs in the background as the conversation goes on
+    st.session_state.scorer = IncrementalScorer() if SCORING_MODE == "incremental" else None
     # Clear any lingering state from previous stations
     for k in ("final_answer", "early_submit", "scored"):
         if k in st.session_state:
@@ -57,30 +118,32 @@ def finish_station():
     """score this station & stash result once only"""
     if "scored" in st.session_state:
         return
-    role_map = {"user": "Student", "assistant": "Patient"}
     
-    # Better transcript processing with debugging
     if not st.session_state.chat:
-        print("DEBUG: No chat messages found in session")
-        transcript = "No conversation recorded."
+        log.debug("No chat messages found in session")
     else:
-        print(f"DEBUG: Processing {len(st.session_state.chat)} chat messages")
-        messages = []
-        for m in st.session_state.chat:
-            role = role_map.get(m.get('role', ''), m.get('role', 'Unknown'))
-            content = m.get('content', '')
-            if content:  # Only add non-empty messages
-                messages.append(f"{role}: {content}")
-        
-        transcript = "\n".join(messages)
-        print(f"DEBUG: Generated transcript with {len(messages)} messages")
+        log.debug("Finalizing score for %d chat messages", len(st.session_state.chat))
     
     cand_ans = st.session_state.get("final_answer","")
-    print(f"DEBUG: Candidate diagnosis: '{cand_ans}'")
+    log.debug("Candidate diagnosis: %r", cand_ans)
     
-    # Add a loading indicator during evaluation
-    with st.spinner("Evaluating your performance..."):
-        st.session_state.results.append(score(transcript, cand_ans))
+    # Scoring runs on the scoring pool so the student can move on at once.
+    # Incremental: most of the checklist was marked during the station, only the final delta is left
+    if st.session_state.scorer is not None:
+        st.session_state.scoring_queue.submit(
+            st.session_state.current,
+            st.session_state.scorer.finalize,
+            list(st.session_state.chat),
+            candidate_dx=cand_ans,
+            case=station
+        )
+    else:
+        st.session_state.scoring_queue.submit(
+            st.session_state.current,
+            score,
+            _format_messages(st.session_state.chat) if st.session_state.chat else "No conversation recorded.",
+            candidate_dx=cand_ans
+        )
     
     st.session_state.scored = True
     
@@ -156,11 +219,11 @@ with right:
 # Display labs and imaging if requested
 if st.session_state.lab:
     with st.expander("🧪 Laboratory Results", expanded=True):
-        dict_to_table(station.labResults)
+        show_table(station_table("labResults", "Waiting for the laboratory results..."), "Laboratory results")
 
 if st.session_state.img:
     with st.expander("🖼️ Imaging Results", expanded=True):
-        dict_to_table(station.imagingResults)
+        show_table(station_table("imagingResults", "Waiting for the imaging results..."), "Imaging results")
 
 # Enhanced chat interface
 st.markdown("### Patient Conversation")
@@ -192,25 +255,47 @@ if not st.session_state.get("early_submit", False) and secs > 0:
 elif st.session_state.get("early_submit", False) and not "scored" in st.session_state:
     st.warning("Please enter your diagnosis above and confirm submission")
     if st.button("Confirm & submit", type="primary", use_container_width=True):
-        # Add loading indicator during station submission
-        with st.spinner("Evaluating your performance..."):
-            finish_station()
+        finish_station()
         st.switch_page("pages/Results.py")
 
 # Chat input
 user_msg = st.chat_input("Ask the patient...", disabled=secs==0)
 if user_msg:
     st.session_state.chat.append({"role":"user","content":user_msg})
-    reply = simulate(station.model_dump(),
-                     st.session_state.chat[:-1], user_msg)
+    
+    # Render the patient's reply live while it streams in
+    with chat_container:
+        st.markdown(f"""
+        <div class="student-message">
+            <strong>Student:</strong> {user_msg}
+        </div>
+        """, unsafe_allow_html=True)
+        reply_box = st.empty()
+    
+    # Created once per station so the persona, prompt and repeat tracking survive between turns
+    if "patient" not in st.session_state:
+        st.session_state.patient = PatientSession(st.session_state.view.patient)
+    
+    partial = ""
+    for delta in simulate_stream(st.session_state.patient,
+                                 st.session_state.chat[:-1], user_msg):
+        partial += delta
+        reply_box.markdown(f"""
+        <div class="patient-message">
+            <strong>Patient:</strong> {partial}▌
+        </div>
+        """, unsafe_allow_html=True)
+    
+    reply = post_process_response(partial)
     st.session_state.chat.append({"role":"assistant","content":reply})
+    if st.session_state.scorer is not None:
+        st.session_state.scorer.observe(st.session_state.chat)
     st.rerun()
 
 # ----------  automatic finish on timeout  ----------
 if is_expired():
-    # Add loading indicator during automatic submission
-    with st.spinner("Time's up! Evaluating your performance..."):
-        finish_station()
+    # Scoring is queued in the background; no need to wait for it here
+    finish_station()
     
     # Check if this was the last station
     if st.session_state.current >= cfg["n"] - 1:
@@ -220,7 +305,7 @@ if is_expired():
         st.session_state.current += 1
         
         # Reset per-station state
-        for k in ("timer", "chat", "lab", "img", "scored", "final_answer", "early_submit"): 
+        for k in ("timer", "chat", "lab", "img", "scored", "final_answer", "early_submit", "patient", "scorer", "view"): 
             if k in st.session_state:
                 st.session_state.pop(k, None)
                 
@@ -232,37 +317,18 @@ if "scored" in st.session_state:
         # Show loading indicator for station transition
         with st.spinner("Loading next station..."):
             # reset per-station state
-            for k in ("timer","chat","lab","img","scored", "final_answer", "early_submit"): 
+            for k in ("timer","chat","lab","img","scored", "final_answer", "early_submit", "patient", "scorer", "view"): 
                 if k in st.session_state:
                     st.session_state.pop(k, None)
                     
             st.session_state.current += 1
             
-            # Check if we need to generate a new station (in case of lazy_generation being True)
-            if st.session_state.get("lazy_generation", False) and st.session_state.current >= len(st.session_state.stations) and st.session_state.current < cfg["n"]:
-                with st.spinner("Generating next station..."):
-                    # Get language from settings
-                    language = cfg.get("language", "en")
-                    st.session_state.stations.append(
-                        generate_case(
-                            lang=language,
-                            chief_override=None,
-                            settings=cfg
-                        )
-                    )
+            # The next station is picked up from the prefetcher (or generated) on rerun
             
             # Check if we've completed all stations
             if st.session_state.current >= cfg["n"]:
-                # Add a loading indicator for results page transition
-                with st.spinner("Preparing final results..."):
-                    # Ensure all stations are properly scored before moving to results
-                    if len(st.session_state.results) == cfg["n"]:
-                        st.switch_page("pages/Results.py")
-                    else:
-                        st.error(f"⚠️ Missing scores for some stations. Expected {cfg['n']} scores but got {len(st.session_state.results)}.")
-                        # Give option to proceed anyway
-                        if st.button("Continue to Results anyway", type="primary"):
-                            st.switch_page("pages/Results.py")
+                # Results.py waits for any stations still being graded
+                st.switch_page("pages/Results.py")
             else:
                 st.rerun()
 
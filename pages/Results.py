@@ -7,6 +7,7 @@ import pandas as pd
 import matplotlib.pyplot as plt
 from app.core.ui import inject_css, dict_to_table, score_color
 from app.core.checklist import CHECKLIST_ITEMS
+from app.core.case_generator import section_available
 
 # Configure page with consistent sidebar handling
 st.set_page_config(
@@ -21,12 +22,37 @@ inject_css()
 
 st.title("📊 OSCE Examination Results")
 
-if not st.session_state.results:
+# Wait only for stations that are still being graded, showing per-station status
+scoring_queue = st.session_state.get("scoring_queue")
+if scoring_queue is not None:
+    pending = scoring_queue.pending()
+    if pending:
+        status_box = st.empty()
+        labels = {"done": "✅ graded", "failed": "⚠️ grading failed", "pending": "⏳ grading...", "missing": "— not submitted"}
+        while pending:
+            status_box.info("\n\n".join(
+                f"Station {i+1}: {labels[scoring_queue.status(i)]}"
+                for i in range(len(st.session_state.results))
+            ))
+            scoring_queue.wait(pending[:1])
+            pending = scoring_queue.pending()
+        status_box.empty()
+    scoring_queue.collect(st.session_state.results)
+
+# (station number, case, result) for every station that has a result, in station order
+scored = [
+    (i, s, r)
+    for i, (s, r) in enumerate(zip(st.session_state.stations, st.session_state.results), 1)
+    if r is not None
+]
+
+if not scored:
     st.warning("No stations were scored – did you leave before submitting?")
     st.stop()
 
 # Calculate overall score, excluding failed stations
-valid_results = [r for r in st.session_state.results if not r.get("scoring_failed", False)]
+valid_scored = [(i, s, r) for i, s, r in scored if not r.get("scoring_failed", False)]
+valid_results = [r for _, _, r in valid_scored]
 if valid_results:
     overall = sum(r["percent"] for r in valid_results) / len(valid_results)
     
@@ -48,11 +74,10 @@ if valid_results:
         # Create bar chart for station scores
         fig, ax = plt.subplots(figsize=(10, 4))
         
-        # Ensure stations and scores arrays have the same length by matching up corresponding elements
-        # This will fix the shape mismatch error
+        # Pair each score with its own station, not with its position in the valid list
         stations = []
         scores = []
-        for i, (s, r) in enumerate(zip(st.session_state.stations[:len(valid_results)], valid_results), 1):
+        for i, s, r in valid_scored:
             stations.append(f"Station {i}: {s.chiefComplaint[:20]}...")
             scores.append(r["percent"])
             
@@ -71,7 +96,7 @@ if valid_results:
         # Add summary table
         st.subheader("Station Summary")
         summary_data = []
-        for i, (s, r) in enumerate(zip(st.session_state.stations[:len(valid_results)], valid_results), 1):
+        for i, s, r in valid_scored:
             summary_data.append({
                 "Station": f"Station {i}",
                 "Chief Complaint": s.chiefComplaint,
@@ -88,7 +113,7 @@ else:
     st.header("Overall: N/A")
 
 # Enhanced station results display
-for idx, (s, r) in enumerate(zip(st.session_state.stations, st.session_state.results), 1):
+for idx, s, r in scored:
     # Handle scoring failure
     if r.get("scoring_failed", False):
         st.error(f"Station {idx}: {s.chiefComplaint} — Scoring failed")
@@ -125,7 +150,10 @@ for idx, (s, r) in enumerate(zip(st.session_state.stations, st.session_state.res
         
         # Safely get main diagnosis
         try:
-            key_dx = s.answer_key.main_diagnosis if hasattr(s.answer_key, "main_diagnosis") else "Unknown"
+            if not section_available(s, "answer_key"):
+                key_dx = "Not available"
+            else:
+                key_dx = s.answer_key.main_diagnosis if hasattr(s.answer_key, "main_diagnosis") else "Unknown"
         except Exception:
             key_dx = "Unknown"
         
@@ -252,13 +280,16 @@ for idx, (s, r) in enumerate(zip(st.session_state.stations, st.session_state.res
             # Diagnosis and management
             with st.expander("Diagnosis and Management", expanded=False):
                 try:
-                    st.markdown(f"**Main Diagnosis:** {s.answer_key.main_diagnosis}")
-                    st.markdown("**Differential Diagnoses:**")
-                    for dx in s.answer_key.differentials:
-                        st.markdown(f"• {dx}")
-                    st.markdown("**Management Plan:**")
-                    for plan in s.answer_key.management:
-                        st.markdown(f"• {plan}")
+                    if section_available(s, "answer_key"):
+                        st.markdown(f"**Main Diagnosis:** {s.answer_key.main_diagnosis}")
+                        st.markdown("**Differential Diagnoses:**")
+                        for dx in s.answer_key.differentials:
+                            st.markdown(f"• {dx}")
+                        st.markdown("**Management Plan:**")
+                        for plan in s.answer_key.management:
+                            st.markdown(f"• {plan}")
+                    else:
+                        st.warning("Answer key details not available")
                 except Exception:
                     st.warning("Answer key details not available")
                     
@@ -272,14 +303,20 @@ for idx, (s, r) in enumerate(zip(st.session_state.stations, st.session_state.res
         with col1:
             st.subheader("Laboratory Results")
             try:
-                dict_to_table(s.labResults)
+                if section_available(s, "labResults"):
+                    dict_to_table(s.labResults)
+                else:
+                    st.info("No lab results available.")
             except Exception:
                 st.info("No lab results available.")
                 
         with col2:
             st.subheader("Imaging Results")
             try:
-                dict_to_table(s.imagingResults)
+                if section_available(s, "imagingResults"):
+                    dict_to_table(s.imagingResults)
+                else:
+                    st.info("No imaging results available.")
             except Exception:
                 st.info("No imaging results available.")
     